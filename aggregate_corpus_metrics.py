@@ -0,0 +1,106 @@
+import os
+import csv
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from compute_translation_metrics import METRIC_FIELDS, get_metrics
+from clean_all_data import canonical_category
+
+BASE_DIR = Path(__file__).resolve().parent
+CLEANED_DATA_DIR = BASE_DIR / 'cleaned_data'
+OUTPUT_DIR = BASE_DIR / 'aggregated_metrics'
+
+GROUP_KEYS = ('llm', 'category', 'round')
+
+def iter_rows(cleaned_data_dir, target_models):
+    """
+    Yields (keys, item) for every scored item, where keys holds the llm,
+    category and round the item belongs to. Both spellings of
+    grammatical_induction map to one category.
+    """
+    for json_file in sorted(cleaned_data_dir.rglob('*.json')):
+        rel_path = json_file.relative_to(cleaned_data_dir)
+        llm = rel_path.parts[0]
+        if target_models and llm not in target_models:
+            continue
+
+        keys = {
+            'llm': llm,
+            'category': canonical_category('/'.join(rel_path.parts[1:-1])),
+            'round': int(json_file.stem),
+        }
+        with open(json_file, 'r', encoding='utf-8') as f:
+            for item in json.load(f):
+                yield keys, item
+
+def aggregate(rows, group_by):
+    """
+    Sums the stored sufficient statistics per group and turns them into
+    corpus-level BLEU, chrF, chrF++ and TER. Items that were scored before
+    the stats were stored are counted as missing; unscored items are skipped.
+    """
+    sums = {}
+    for keys, item in rows:
+        group = tuple(keys[k] for k in group_by)
+        entry = sums.setdefault(group, {'sample_count': 0, 'missing_stats': 0, 'stats': {}})
+
+        if any(stats_field not in item for _, stats_field in METRIC_FIELDS.values()):
+            if 'bleu_score' in item:
+                entry['missing_stats'] += 1
+            continue
+        entry['sample_count'] += 1
+        for name, (_, stats_field) in METRIC_FIELDS.items():
+            stats = np.asarray(item[stats_field], dtype=np.float64)
+            if name in entry['stats']:
+                entry['stats'][name] += stats
+            else:
+                entry['stats'][name] = stats
+
+    metrics = get_metrics(sentence_level=False)
+    results = []
+    for group in sorted(sums):
+        entry = sums[group]
+        result = dict(zip(group_by, group))
+        result['sample_count'] = entry['sample_count']
+        result['missing_stats'] = entry['missing_stats']
+        for name, (score_field, _) in METRIC_FIELDS.items():
+            stats = entry['stats'].get(name)
+            result[f'corpus_{score_field}'] = (
+                metrics[name]._compute_score_from_stats(stats.tolist()).score
+                if stats is not None else None)
+        results.append(result)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute corpus-level BLEU/chrF/chrF++/TER from stored sufficient statistics.')
+    parser.add_argument('models', nargs='*', help='List of model names (directories) to aggregate. If empty, aggregates all.')
+    parser.add_argument('--group-by', nargs='+', default=list(GROUP_KEYS), choices=GROUP_KEYS, help='Keys to group rows by (default: llm category round).')
+    parser.add_argument('--output', default=None, help='CSV file to write (default: aggregated_metrics/corpus_metrics_<keys>.csv).')
+    args = parser.parse_args()
+
+    if not CLEANED_DATA_DIR.exists():
+        print(f"Directory '{CLEANED_DATA_DIR}' not found.")
+        return
+
+    results = aggregate(iter_rows(CLEANED_DATA_DIR, args.models), args.group_by)
+    if not results:
+        print("No scored items found.")
+        return
+
+    output = args.output or os.path.join(OUTPUT_DIR, f"corpus_metrics_{'_'.join(args.group_by)}.csv")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+
+    missing = sum(r['missing_stats'] for r in results)
+    if missing:
+        print(f"{missing} items have no stored stats; re-run compute_translation_metrics.py for them.")
+    print(f"Saved {len(results)} groups to {output}")
+
+if __name__ == "__main__":
+    main()
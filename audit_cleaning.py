@@ -0,0 +1,244 @@
+import os
+import csv
+import json
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from clean_all_data import clean_target, clean_actual
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (root, file extension) pairs audited by default. Raw CSVs under Data/ are
+# cleaned on the fly; cleaned_data/ JSON files are audited as stored.
+DEFAULT_ROOTS = [
+    (os.path.join(BASE_DIR, 'Data'), '.csv'),
+    (os.path.join(BASE_DIR, 'cleaned_data'), '.json'),
+]
+
+FLAGS = (
+    'slash_target',
+    'paren_target',
+    'aggressive_truncation',
+    'empty_actual',
+    'variant_blowup',
+)
+
+def strip_quotes(text):
+    return text.replace('"""', '').replace('"', '').strip()
+
+def flag_record(record, truncation_ratio, max_variants):
+    """
+    Returns the list of audit flags raised by one cleaned record.
+    """
+    raw_target = record['raw_target'] or ''
+    raw_actual = strip_quotes(record['raw_actual'] or '')
+    actual = record['actual'] or ''
+    flags = []
+
+    if '/' in raw_target:
+        flags.append('slash_target')
+    if '(' in raw_target or ')' in raw_target:
+        flags.append('paren_target')
+
+    if not actual and raw_actual:
+        flags.append('empty_actual')
+    elif raw_actual and len(actual) < len(raw_actual) * truncation_ratio:
+        flags.append('aggressive_truncation')
+
+    if len(record['targets']) > max_variants:
+        flags.append('variant_blowup')
+    return flags
+
+def iter_csv_records(path):
+    """
+    Streams rows of a raw experiment CSV, cleaned with the same rules as
+    clean_all_data.py.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        line = f.readline()
+        delimiter = ';' if ';' in line else ','
+        f.seek(0)
+        for i, row in enumerate(csv.DictReader(f, delimiter=delimiter)):
+            target_raw = row.get('Target Output')
+            if target_raw is None:
+                continue
+            actual_raw = row.get('Actual Output') or ''
+            yield {
+                'row': i + 2,
+                'targets': clean_target(target_raw),
+                'actual': clean_actual(actual_raw),
+                'raw_target': target_raw,
+                'raw_actual': actual_raw,
+            }
+
+def iter_json_records(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for item in data:
+        yield {
+            'row': item.get('row'),
+            'targets': item.get('targets') or [],
+            'actual': item.get('actual'),
+            'raw_target': item.get('raw_target'),
+            'raw_actual': item.get('raw_actual'),
+        }
+
+def audit_file(path, truncation_ratio, max_variants, max_examples):
+    """
+    Audits one file and returns (rows, {flag: count}, {flag: [examples]}, error).
+    """
+    counts = dict.fromkeys(FLAGS, 0)
+    examples = {flag: [] for flag in FLAGS}
+    rows = 0
+    records = iter_csv_records(path) if path.endswith('.csv') else iter_json_records(path)
+
+    try:
+        for record in records:
+            rows += 1
+            for flag in flag_record(record, truncation_ratio, max_variants):
+                counts[flag] += 1
+                if len(examples[flag]) < max_examples:
+                    examples[flag].append({
+                        'file': os.path.basename(path),
+                        'row': record['row'],
+                        'raw_target': record['raw_target'],
+                        'targets': record['targets'],
+                        'raw_actual': record['raw_actual'],
+                        'actual': record['actual'],
+                    })
+    except Exception as e:
+        return rows, counts, examples, str(e)
+
+    return rows, counts, examples, None
+
+def collect_files(roots, target_models):
+    """
+    Yields (source, model, category, path) for every auditable file.
+    """
+    for root_dir, extension in roots:
+        if not os.path.exists(root_dir):
+            print(f"Directory '{root_dir}' not found, skipping.")
+            continue
+        source = os.path.basename(os.path.normpath(root_dir))
+
+        for root, dirs, files in os.walk(root_dir):
+            rel_from_source = os.path.relpath(root, root_dir)
+            if rel_from_source == '.':
+                if target_models:
+                    dirs[:] = [d for d in dirs if d in target_models]
+                continue
+
+            # Nested cleaned_data folders under Data/ are leftovers of older runs
+            dirs[:] = [d for d in dirs if d != 'cleaned_data']
+            parts = rel_from_source.split(os.sep)
+            model, category = parts[0], '/'.join(parts[1:])
+
+            for file in sorted(files):
+                if file.endswith(extension):
+                    yield source, model, category, os.path.join(root, file)
+
+def run_audit(roots, target_models, workers, truncation_ratio, max_variants, max_examples):
+    """
+    Audits every file and merges the results per (source, model, category).
+    """
+    jobs = sorted(collect_files(roots, target_models))
+    args = [(path, truncation_ratio, max_variants, max_examples) for _, _, _, path in jobs]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(audit_file, *zip(*args), chunksize=8)) if args else []
+    else:
+        results = [audit_file(*a) for a in args]
+
+    groups = {}
+    for (source, model, category, path), (rows, counts, examples, error) in zip(jobs, results):
+        group = groups.setdefault((source, model, category), {
+            'source': source,
+            'model': model,
+            'category': category,
+            'files': 0,
+            'rows': 0,
+            'counts': dict.fromkeys(FLAGS, 0),
+            'examples': {flag: [] for flag in FLAGS},
+            'errors': [],
+        })
+        group['files'] += 1
+        group['rows'] += rows
+        if error:
+            group['errors'].append({'file': path, 'error': error})
+        for flag in FLAGS:
+            group['counts'][flag] += counts[flag]
+            room = max_examples - len(group['examples'][flag])
+            group['examples'][flag].extend(examples[flag][:room])
+
+    return [groups[key] for key in sorted(groups)]
+
+def print_summary(groups, show_examples):
+    header = f"{'source':<13}{'model':<11}{'category':<32}{'rows':>6}" + ''.join(f"{f:>23}" for f in FLAGS)
+    print(header)
+    print('-' * len(header))
+    for group in groups:
+        line = f"{group['source']:<13}{group['model']:<11}{group['category']:<32}{group['rows']:>6}"
+        line += ''.join(f"{group['counts'][f]:>23}" for f in FLAGS)
+        print(line)
+
+        for error in group['errors']:
+            print(f"  [ERROR] {error['file']}: {error['error']}")
+        if not show_examples:
+            continue
+        for flag in FLAGS:
+            for ex in group['examples'][flag]:
+                print(f"  [{flag}] {ex['file']} row {ex['row']}")
+                print(f"    Raw target: {ex['raw_target']!r} -> {ex['targets']}")
+                print(f"    Raw actual: {ex['raw_actual'][:120]!r} -> {str(ex['actual'])[:120]!r}")
+
+    totals = {flag: sum(g['counts'][flag] for g in groups) for flag in FLAGS}
+    print('-' * len(header))
+    print(f"Audited {sum(g['rows'] for g in groups)} rows in {sum(g['files'] for g in groups)} files: "
+          + ', '.join(f"{flag}={count}" for flag, count in totals.items()))
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description='Audit data cleaning across all models and categories.')
+    parser.add_argument('models', nargs='*', help='List of model names (directories) to audit. If empty, audits all.')
+    parser.add_argument('--source', choices=['data', 'cleaned', 'both'], default='both', help='Audit raw Data/ CSVs (cleaned on the fly), cleaned_data/ JSON, or both.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes.')
+    parser.add_argument('--truncation-ratio', type=float, default=0.5, help='Flag actuals cleaned to less than this fraction of the raw length.')
+    parser.add_argument('--max-variants', type=int, default=8, help='Flag targets that expand into more variants than this.')
+    parser.add_argument('--examples', type=int, default=3, help='Sampled examples kept per flag and group.')
+    parser.add_argument('--show-examples', action='store_true', help='Print sampled examples under each group.')
+    parser.add_argument('--report', help='Write the full machine-readable report to this JSON file.')
+    parser.add_argument('--fail-on', nargs='*', default=[], choices=FLAGS, help='Exit with status 1 if any of these flags is raised (for use as a pre-scoring gate).')
+    args = parser.parse_args()
+
+    roots = DEFAULT_ROOTS
+    if args.source == 'data':
+        roots = DEFAULT_ROOTS[:1]
+    elif args.source == 'cleaned':
+        roots = DEFAULT_ROOTS[1:]
+
+    groups = run_audit(roots, args.models, args.workers, args.truncation_ratio, args.max_variants, args.examples)
+    totals = print_summary(groups, args.show_examples)
+
+    if args.report:
+        report = {
+            'settings': {
+                'truncation_ratio': args.truncation_ratio,
+                'max_variants': args.max_variants,
+                'examples': args.examples,
+            },
+            'totals': totals,
+            'groups': groups,
+        }
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Wrote report to {args.report}")
+
+    failed = [flag for flag in args.fail_on if totals[flag] > 0]
+    if failed:
+        print(f"Audit failed on: {failed}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import sys
+import asyncio
+import time
+import argparse
+from concurrent.futures import Future
+
+from inference_backends import BackendError, Scheduler, _Request, make_backend
+from stub_backend import StubBackend
+
+# Run the scheduler against stub_backend.py and check its policies:
+#   python check_scheduler.py
+
+def run_jobs(scheduler, prompts):
+    results = {}
+    scheduler.run(enumerate(prompts), lambda key, result: results.__setitem__(key, result))
+    return [results[i] for i in range(len(prompts))]
+
+def make_scheduler(urls, backend='openai', concurrency=4, rate=None, timeout=10.0, **options):
+    options.setdefault('backoff_base', 0.05)
+    options.setdefault('backoff_cap', 0.2)
+    return Scheduler(make_backend(backend, 'stub', urls[backend], None, concurrency, rate, timeout), **options)
+
+def check_concurrency(stub, urls):
+    stub.latency = 0.05
+    results = run_jobs(make_scheduler(urls, concurrency=3), [f"q{i}" for i in range(20)])
+    assert all(not isinstance(r, BackendError) for r in results), results
+    assert stub.max_in_flight <= 3, f"peak concurrency {stub.max_in_flight} > 3"
+
+def check_rate(stub, urls):
+    # Burst of `concurrency` tokens, then one request every 1/rate seconds
+    run_jobs(make_scheduler(urls, concurrency=4, rate=20), [f"q{i}" for i in range(30)])
+    span = stub.started[-1] - stub.started[0]
+    expected = (30 - 4) / 20
+    assert span >= 0.9 * expected, f"30 requests at 20/s took {span:.2f}s, expected >= {expected:.2f}s"
+
+def check_retry_after(stub, urls):
+    scheduler = make_scheduler(urls)
+    prompt = "[stub fail=1 status=429 retry_after=1] q"
+    result, = run_jobs(scheduler, [prompt])
+    assert result.text == f"echo: {prompt}", result
+    gap = stub.started[1] - stub.started[0]
+    assert gap >= 1.0, f"retried {gap:.2f}s after a 429 with Retry-After: 1"
+    assert scheduler.retries == 1
+
+def check_server_errors(stub, urls):
+    scheduler = make_scheduler(urls, backend='ollama')
+    prompt = "[stub fail=2 status=503] q"
+    result, = run_jobs(scheduler, [prompt])
+    assert not isinstance(result, BackendError), result
+    assert stub.attempts[prompt] == 3 and scheduler.retries == 2
+
+def check_retries_exhausted(stub, urls):
+    scheduler = make_scheduler(urls, max_retries=2)
+    result, = run_jobs(scheduler, ["[stub fail=10 status=502] q"])
+    assert isinstance(result, BackendError) and result.retryable, result
+    assert stub.requests == 3
+
+def check_not_retryable(stub, urls):
+    scheduler = make_scheduler(urls)
+    result, = run_jobs(scheduler, ["[stub fail=1 status=400] q"])
+    assert isinstance(result, BackendError) and not result.retryable, result
+    assert stub.requests == 1 and scheduler.retries == 0
+
+def check_deadline(stub, urls):
+    scheduler = make_scheduler(urls, timeout=0.3)
+    start = time.monotonic()
+    result, = run_jobs(scheduler, ["[stub sleep_first=2] q"])
+    elapsed = time.monotonic() - start
+    assert not isinstance(result, BackendError), result
+    assert scheduler.timeouts == 1 and scheduler.retries == 1, scheduler.summary()
+    assert elapsed < 1.5, f"a 0.3s deadline took {elapsed:.2f}s to retry"
+
+def check_hedge_latency(stub, urls):
+    # One request at a time, as run_ollama sends them; every 30th is slow.
+    # Slow requests are spaced out so the dropped one has returned and freed
+    # the single hedge slot before the next one needs it.
+    stub.latency, stub.slow_every, stub.slow_seconds = 0.05, 30, 1.0
+    scheduler = make_scheduler(urls, backend='ollama', concurrency=1, hedge=True)
+    slowest = 0.0
+    for i in range(90):
+        start = time.monotonic()
+        scheduler.generate(f"q{i}")
+        slowest = max(slowest, time.monotonic() - start)
+    scheduler.close()
+    assert scheduler.hedge_wins >= 2, scheduler.summary()
+    assert slowest < 0.5, f"slowest call took {slowest:.2f}s despite {scheduler.summary()}"
+
+def check_hedge_budget(stub, urls):
+    stub.slow_every, stub.slow_seconds = 40, 1.0
+    scheduler = make_scheduler(urls, concurrency=4, hedge=True)
+    run_jobs(scheduler, [f"q{i}" for i in range(120)])
+    scheduler.close()
+    assert 1 <= scheduler.hedges <= 0.1 * scheduler.requests, \
+        f"{scheduler.hedges} hedges for {scheduler.requests} requests"
+    assert stub.max_in_flight <= 8, f"peak concurrency {stub.max_in_flight} > 2 x 4"
+
+def check_drop_after_return(stub, urls):
+    # A losing request whose thread returned before its task ran must not
+    # have its (already released) slot handed over to the hedge slots
+    scheduler = make_scheduler(urls, concurrency=1, hedge=True)
+    scheduler.run([], None)
+
+    async def lose_race():
+        request = _Request(scheduler.slots)
+        await scheduler.slots.acquire()
+        request.start = time.monotonic()
+        future = Future()
+        future.set_result(None)
+        scheduler._finished(request, future)
+        task = asyncio.ensure_future(asyncio.sleep(0))
+        await scheduler._drop(request, task)
+
+    scheduler.loop.run_until_complete(lose_race())
+    slots, hedge_slots = scheduler.slots._value, scheduler.hedge_slots._value
+    scheduler.close()
+    assert (slots, hedge_slots) == (1, 1), f"slots {slots}, hedge slots {hedge_slots} after the race, expected 1 and 1"
+
+def check_inside_running_loop(stub, urls):
+    # Blocking callers such as run_ollama may be called from async code (Jupyter)
+    scheduler = make_scheduler(urls)
+
+    async def caller():
+        return scheduler.generate("q")
+
+    result = asyncio.run(caller())
+    scheduler.close()
+    assert result.text == "echo: q", result
+
+CHECKS = [
+    check_concurrency,
+    check_rate,
+    check_retry_after,
+    check_server_errors,
+    check_retries_exhausted,
+    check_not_retryable,
+    check_deadline,
+    check_hedge_latency,
+    check_hedge_budget,
+    check_drop_after_return,
+    check_inside_running_loop,
+]
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the request scheduler against a local stub backend.')
+    parser.add_argument('checks', nargs='*', help='Checks to run (e.g. check_rate). If empty, runs all.')
+    args = parser.parse_args()
+
+    failed = 0
+    for check in CHECKS:
+        if args.checks and check.__name__ not in args.checks:
+            continue
+        stub = StubBackend()
+        server = stub.serve()
+        port = server.server_address[1]
+        urls = {
+            'openai': f"http://127.0.0.1:{port}/v1",
+            'ollama': f"http://127.0.0.1:{port}/api/generate",
+        }
+        start = time.monotonic()
+        try:
+            check(stub, urls)
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {check.__name__}: {e}")
+        else:
+            print(f"ok   {check.__name__} ({time.monotonic() - start:.1f}s)")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
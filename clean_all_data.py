@@ -94,12 +94,22 @@ def clean_actual(actual_raw):
     # Final cleanup
     return best_candidate
 
+# Hosted-model directories spell it "grammatical_induction"; reports fold
+# both spellings into the one the local models use
+CATEGORY_ALIASES = {
+    'grammatical_induction': 'gramatical_induction',
+}
+
+def canonical_category(category):
+    """grammatical_induction/... -> gramatical_induction/..., other paths unchanged."""
+    return '/'.join(CATEGORY_ALIASES.get(part, part) for part in category.split('/'))
+
 def process_all_data():
     parser = argparse.ArgumentParser(description='Clean data for specified models.')
     parser.add_argument('models', nargs='*', help='List of model names (directories) to clean. If empty, cleans all.')
     args = parser.parse_args()
 
-    base_dir = '/home/ninin/projects/Research'
+    base_dir = os.path.dirname(os.path.abspath(__file__))
     source_dir = os.path.join(base_dir, 'Data')
     dest_dir = os.path.join(base_dir, 'cleaned_data')
     
@@ -1,15 +1,47 @@
 import os
 import json
 import logging
-from bert_score import score
 import warnings
 
+import scoring_client
+
 # Suppress some warnings from transformers/bert_score
 warnings.filterwarnings("ignore")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_scorer = None
+
+def get_bert_scorer():
+    """
+    Loads the BERTScore model once per process. bert_score (and with it
+    torch/transformers) is only imported here, so runs served by
+    scoring_server.py never pay for it.
+    """
+    global _scorer
+    if _scorer is None:
+        from bert_score import BERTScorer
+        # using default model (roberta-large for English is common, or let it decide)
+        # lang='en' is usually good to specify if we know it's English, but 
+        # looking at the data, it seems to involve constructed languages or definitions in English.
+        # The targets are English definitions mostly.
+        # I'll set lang='en' to be safe and efficient, relying on English embedding.
+        _scorer = BERTScorer(lang='en')
+    return _scorer
+
+def bert_scores_local(cands, refs):
+    """Returns (P, R, F1) as lists of floats, scored in this process."""
+    P, R, F1 = get_bert_scorer().score(cands, refs, verbose=False)
+    return [float(x) for x in P], [float(x) for x in R], [float(x) for x in F1]
+
+def bert_scores(cands, refs):
+    """Returns (P, R, F1), from the scoring server if one is running."""
+    return scoring_client.score_or_fallback(
+        '/score/bert', {'cands': cands, 'refs': refs},
+        lambda: bert_scores_local(cands, refs),
+        lambda reply: (reply['P'], reply['R'], reply['F1']))
+
 def compute_bert_metrics(json_file_path):
     """
     Computes BERT scores (P, R, F1) for a given JSON file
@@ -63,12 +95,7 @@ def compute_bert_metrics(json_file_path):
 
     try:
         # Compute scores
-        # using default model (roberta-large for English is common, or let it decide)
-        # lang='en' is usually good to specify if we know it's English, but 
-        # looking at the data, it seems to involve constructed languages or definitions in English.
-        # The targets are English definitions mostly.
-        # I'll set lang='en' to be safe and efficient, relying on English embedding.
-        P, R, F1 = score(cands, refs, lang='en', verbose=False)
+        P, R, F1 = bert_scores(cands, refs)
         
         # Update data
         for idx, p_val, r_val, f1_val in zip(indices, P, R, F1):
@@ -88,9 +115,10 @@ def compute_bert_metrics(json_file_path):
 def main():
     parser = argparse.ArgumentParser(description='Compute BERT scores for specified models.')
     parser.add_argument('models', nargs='*', help='List of model names (directories) to compute metrics for. If empty, computes for all.')
+    parser.add_argument('--skip-categories', nargs='*', default=[], help='Categories to skip because compute_match_metrics.py is enough for them (e.g. few_shot/word_question morphological_induction).')
     args = parser.parse_args()
 
-    cleaned_data_dir = os.path.join('/home/ninin/projects/Research', 'cleaned_data')
+    cleaned_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cleaned_data')
     
     if not os.path.exists(cleaned_data_dir):
         logger.error(f"Directory '{cleaned_data_dir}' not found.")
@@ -103,6 +131,9 @@ def main():
     else:
         logger.info("Targeting ALL models.")
 
+    if args.skip_categories:
+        logger.info(f"Skipping categories: {args.skip_categories}")
+
     # Count files first
     files_to_process = []
     for root, dirs, files in os.walk(cleaned_data_dir):
@@ -113,6 +144,11 @@ def main():
             if target_models:
                 dirs[:] = [d for d in dirs if d in target_models]
 
+        # Category is everything below the model directory
+        category = '/'.join(rel_from_source.split(os.sep)[1:])
+        if category in args.skip_categories:
+            continue
+
         for file in files:
             if file.endswith('.json'):
                 files_to_process.append(os.path.join(root, file))
@@ -0,0 +1,245 @@
+import os
+import json
+import re
+import argparse
+import unicodedata
+import numpy as np
+
+# Fields written next to the sacrebleu / BERTScore metrics
+MATCH_FIELDS = ('exact_match', 'token_f1', 'char_edit_distance')
+
+# Pairs are processed in length-sorted chunks so padding stays small
+EDIT_DISTANCE_CHUNK = 256
+
+def normalize_text(text):
+    """
+    Lowercases, strips punctuation and collapses whitespace so that
+    "Parent-related." and "parent related" compare equal.
+    """
+    text = unicodedata.normalize('NFKC', str(text)).lower()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def batched_edit_distance(hyps, refs):
+    """
+    Levenshtein distance for every (hyps[k], refs[k]) pair.
+
+    The DP runs row by row over the hypothesis characters, vectorized across
+    all pairs of a chunk and all reference positions. Insertions within a row
+    are resolved with a running minimum over `cur[j] - j`.
+    """
+    n_pairs = len(hyps)
+    distances = np.zeros(n_pairs, dtype=np.int64)
+    if n_pairs == 0:
+        return distances
+
+    hyp_lens = np.array([len(h) for h in hyps], dtype=np.int64)
+    ref_lens = np.array([len(r) for r in refs], dtype=np.int64)
+    order = np.argsort(hyp_lens, kind='stable')
+
+    for start in range(0, n_pairs, EDIT_DISTANCE_CHUNK):
+        idx = order[start:start + EDIT_DISTANCE_CHUNK]
+        h_lens = hyp_lens[idx]
+        r_lens = ref_lens[idx]
+        max_h = int(h_lens.max())
+        max_r = int(r_lens.max())
+
+        # Pad with values that never match each other
+        H = np.full((len(idx), max_h), -1, dtype=np.int64)
+        R = np.full((len(idx), max_r), -2, dtype=np.int64)
+        for row, k in enumerate(idx):
+            if h_lens[row]:
+                H[row, :h_lens[row]] = [ord(c) for c in hyps[k]]
+            if r_lens[row]:
+                R[row, :r_lens[row]] = [ord(c) for c in refs[k]]
+
+        cols = np.arange(max_r + 1, dtype=np.int64)
+        rows = np.arange(len(idx))
+        prev = np.tile(cols, (len(idx), 1))
+        result = r_lens.copy()  # empty hypothesis: insert every ref char
+
+        for i in range(1, max_h + 1):
+            cur = np.empty_like(prev)
+            cur[:, 0] = i
+            substitute = prev[:, :-1] + (H[:, i - 1:i] != R)
+            delete = prev[:, 1:] + 1
+            cur[:, 1:] = np.minimum(substitute, delete)
+            cur = np.minimum.accumulate(cur - cols, axis=1) + cols
+
+            done = h_lens == i
+            if done.any():
+                result[done] = cur[rows[done], r_lens[done]]
+            prev = cur
+
+        distances[idx] = result
+
+    return distances
+
+def batched_token_f1(hyp_tokens, ref_tokens):
+    """
+    Bag-of-words F1 for every (hyp_tokens[k], ref_tokens[k]) pair.
+
+    Tokens are mapped to integer ids and counted per pair with np.unique, so
+    the overlap for all pairs comes out of a single intersection.
+    """
+    n_pairs = len(hyp_tokens)
+    if n_pairs == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    vocab = {}
+    def encode(token_lists):
+        pair_ids, token_ids = [], []
+        for k, tokens in enumerate(token_lists):
+            pair_ids.extend([k] * len(tokens))
+            token_ids.extend(vocab.setdefault(t, len(vocab)) for t in tokens)
+        return np.array(pair_ids, dtype=np.int64), np.array(token_ids, dtype=np.int64)
+
+    hyp_pairs, hyp_ids = encode(hyp_tokens)
+    ref_pairs, ref_ids = encode(ref_tokens)
+    vocab_size = max(len(vocab), 1)
+
+    hyp_keys, hyp_counts = np.unique(hyp_pairs * vocab_size + hyp_ids, return_counts=True)
+    ref_keys, ref_counts = np.unique(ref_pairs * vocab_size + ref_ids, return_counts=True)
+    shared, hyp_pos, ref_pos = np.intersect1d(hyp_keys, ref_keys, assume_unique=True, return_indices=True)
+
+    overlap = np.bincount(shared // vocab_size,
+                          weights=np.minimum(hyp_counts[hyp_pos], ref_counts[ref_pos]),
+                          minlength=n_pairs)
+    hyp_len = np.bincount(hyp_pairs, minlength=n_pairs).astype(np.float64)
+    ref_len = np.bincount(ref_pairs, minlength=n_pairs).astype(np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(hyp_len > 0, overlap / hyp_len, 0.0)
+        recall = np.where(ref_len > 0, overlap / ref_len, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    # Both sides empty counts as a match
+    f1[(hyp_len == 0) & (ref_len == 0)] = 1.0
+    return f1
+
+def compute_match_scores(items):
+    """
+    Computes exact match, token F1 and normalized character edit distance for
+    a list of {'actual', 'targets'} records, taking the best value over all
+    targets. Returns one dict per item (None for items without a usable
+    actual/targets pair).
+    """
+    hyps, refs, owners = [], [], []
+    for n, item in enumerate(items):
+        actual = item.get('actual')
+        targets = item.get('targets')
+        if actual is None or not targets:
+            continue
+        if isinstance(targets, str):
+            targets = [targets]
+
+        hyp = normalize_text(actual)
+        for target in targets:
+            hyps.append(hyp)
+            refs.append(normalize_text(target))
+            owners.append(n)
+
+    results = [None] * len(items)
+    if not owners:
+        return results
+
+    owners = np.array(owners, dtype=np.int64)
+    exact = np.array([h == r for h, r in zip(hyps, refs)], dtype=np.float64)
+    token_f1 = batched_token_f1([h.split() for h in hyps], [r.split() for r in refs])
+
+    distances = batched_edit_distance(hyps, refs)
+    longest = np.array([max(len(h), len(r)) for h, r in zip(hyps, refs)], dtype=np.float64)
+    edit = np.divide(distances, longest, out=np.zeros_like(longest), where=longest > 0)
+
+    # Pairs of one item are contiguous, so reduce per item segment
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+    best_exact = np.maximum.reduceat(exact, starts)
+    best_f1 = np.maximum.reduceat(token_f1, starts)
+    best_edit = np.minimum.reduceat(edit, starts)
+
+    for seg, n in enumerate(owners[starts]):
+        results[n] = {
+            'exact_match': int(best_exact[seg]),
+            'token_f1': float(best_f1[seg]),
+            'char_edit_distance': float(best_edit[seg]),
+        }
+    return results
+
+def compute_match_metrics_bulk(json_file_paths):
+    """
+    Loads every file, scores all items in a single batch and writes the
+    match fields back next to the existing metrics.
+    """
+    loaded = []
+    all_items = []
+    for json_file_path in json_file_paths:
+        try:
+            with open(json_file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Error reading {json_file_path}: {e}")
+            continue
+        loaded.append((json_file_path, data, len(all_items)))
+        all_items.extend(data)
+
+    print(f"Scoring {len(all_items)} items from {len(loaded)} files...")
+    scores = compute_match_scores(all_items)
+
+    for json_file_path, data, offset in loaded:
+        updated_count = 0
+        for item, item_scores in zip(data, scores[offset:offset + len(data)]):
+            if item_scores is not None:
+                item.update(item_scores)
+                updated_count += 1
+
+        if updated_count == 0:
+            print(f"No items updated in {json_file_path}.")
+            continue
+        try:
+            with open(json_file_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+            print(f"Updated {json_file_path} with match metrics for {updated_count} items.")
+        except Exception as e:
+            print(f"Error writing updates to {json_file_path}: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute exact match, token F1 and character edit distance for specified models.')
+    parser.add_argument('models', nargs='*', help='List of model names (directories) to compute metrics for. If empty, computes for all.')
+    parser.add_argument('--categories', nargs='*', default=[], help='Only score these categories (e.g. few_shot/word_question morphological_induction). If empty, scores all.')
+    args = parser.parse_args()
+
+    cleaned_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cleaned_data')
+
+    if not os.path.exists(cleaned_data_dir):
+        print(f"Directory '{cleaned_data_dir}' not found.")
+        return
+
+    target_models = args.models if args.models else []
+
+    if target_models:
+        print(f"Targeting models: {target_models}")
+    else:
+        print("Targeting ALL models.")
+
+    files_to_process = []
+    for root, dirs, files in os.walk(cleaned_data_dir):
+        rel_from_source = os.path.relpath(root, cleaned_data_dir)
+
+        if rel_from_source == '.':
+            if target_models:
+                dirs[:] = [d for d in dirs if d in target_models]
+            continue
+
+        # Category is everything below the model directory
+        category = '/'.join(rel_from_source.split(os.sep)[1:])
+        if args.categories and category not in args.categories:
+            continue
+
+        for file in files:
+            if file.endswith('.json'):
+                files_to_process.append(os.path.join(root, file))
+
+    compute_match_metrics_bulk(sorted(files_to_process))
+
+if __name__ == "__main__":
+    main()
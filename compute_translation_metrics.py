@@ -1,6 +1,113 @@
 import os
 import json
-import sacrebleu
+
+import scoring_client
+from reference_index import ReferenceIndex
+
+# Persisted reference-side state, shared by all models (see reference_index.py)
+REFERENCE_INDEX_FILE = 'reference_index.pkl'
+
+# (score field, sufficient-statistics field) for each sacrebleu metric
+METRIC_FIELDS = {
+    'bleu': ('bleu_score', 'bleu_stats'),
+    'chrf': ('chrF_score', 'chrF_stats'),
+    'chrf_plus': ('chrF_plus_score', 'chrF_plus_stats'),
+    'ter': ('ter_test', 'ter_stats'),
+}
+
+_metrics = None
+
+def get_metrics(sentence_level=True):
+    """
+    Builds the sacrebleu metric objects once per process. Sentence-level BLEU
+    uses effective order (as sacrebleu.sentence_bleu does); corpus-level BLEU
+    does not. The other metrics are configured the same way at both levels.
+    """
+    global _metrics
+    # Imported here so runs served by scoring_server.py skip the import
+    from sacrebleu.metrics import BLEU, CHRF, TER
+
+    if not sentence_level:
+        return {
+            'bleu': BLEU(),
+            'chrf': CHRF(),
+            'chrf_plus': CHRF(word_order=2),
+            'ter': TER(),
+        }
+    if _metrics is None:
+        _metrics = {
+            'bleu': BLEU(effective_order=True),
+            'chrf': CHRF(),
+            'chrf_plus': CHRF(word_order=2),
+            'ter': TER(),
+        }
+    return _metrics
+
+_reference_index = None
+
+def get_reference_index():
+    """The process-wide reference index for the sentence-level metrics."""
+    global _reference_index
+    if _reference_index is None:
+        import sacrebleu
+        metrics = get_metrics()
+        # sacrebleu version plus each metric's plain settings (order, tokenizer name, ...)
+        signature = (sacrebleu.__version__,) + tuple(
+            (name, metric.__class__.__name__, tuple(sorted(
+                (k, v) for k, v in vars(metric).items() if isinstance(v, (bool, int, float, str)))))
+            for name, metric in metrics.items())
+        _reference_index = ReferenceIndex(metrics, signature)
+    return _reference_index
+
+def score_translation(actual, targets):
+    """
+    Returns the BLEU, chrF, chrF++ and TER fields for one hypothesis against
+    its list of targets, together with each metric's sufficient statistics:
+
+    - bleu_stats: [hyp_len, ref_len, matches 1-4, totals 1-4]
+    - chrF_stats / chrF_plus_stats: [hyp, ref, match] counts per character
+      (then word) n-gram order, for the best-matching target
+    - ter_stats: [edits, average ref length]
+
+    Summing the stats over any group of rows and passing them to the
+    corpus-level metric gives exact corpus scores without re-tokenizing
+    (see aggregate_corpus_metrics.py). The sentence scores are computed from
+    the same stats and match sacrebleu.sentence_bleu/chrf/ter.
+
+    Reference n-grams and TER reference words come from the shared reference
+    index, so only the hypothesis side is computed per model.
+    """
+    reference_info = get_reference_index().lookup(targets)
+    scores = {}
+
+    for name, metric in get_metrics().items():
+        score_field, stats_field = METRIC_FIELDS[name]
+        hypothesis = metric._preprocess_segment(actual)
+        stats = metric._compute_segment_statistics(hypothesis, reference_info[name])
+        scores[score_field] = metric._compute_score_from_stats(stats).score
+        scores[stats_field] = [float(x) if name == 'ter' else int(x) for x in stats]
+
+    return scores
+
+def score_translation_items(items):
+    """
+    Scores a batch of {'actual', 'targets'} records. Returns one dict per
+    record, or {'error': message} if that record could not be scored.
+    """
+    results = []
+    for item in items:
+        try:
+            results.append(score_translation(item['actual'], item['targets']))
+        except Exception as e:
+            results.append({'error': str(e)})
+    return results
+
+def score_batch(items):
+    """Like score_translation_items, on the scoring server if one is running."""
+    return scoring_client.score_or_fallback(
+        '/score/translation', {'items': items},
+        lambda: score_translation_items(items),
+        lambda reply: reply['scores'])
 
 def compute_metrics(json_file_path):
     """
@@ -18,7 +125,8 @@ def compute_metrics(json_file_path):
         print(f"Error opening {json_file_path}: {e}")
         return
 
-    updated_count = 0
+    batch = []
+    batch_items = []
     for item in data:
         actual = item.get('actual')
         targets = item.get('targets')
@@ -26,13 +134,6 @@ def compute_metrics(json_file_path):
         if actual is None or targets is None:
             continue
         
-        # sacrebleu expects a list of references for each hypothesis locally, 
-        # but the library functions usually take [hyp] and [[ref1, ref2]] (list of list of refs) for corpus level.
-        # For sentence level:
-        # sacrebleu.sentence_bleu(hypothesis: str, references: List[str])
-        # sacrebleu.sentence_chrf(hypothesis: str, references: List[str], order=6, beta=2, remove_whitespace=True)
-        # sacrebleu.sentence_ter(hypothesis: str, references: List[str])
-        
         # Ensure actual is a string
         if not isinstance(actual, str):
             actual = str(actual)
@@ -46,27 +147,16 @@ def compute_metrics(json_file_path):
                 # If it's something else, try to cast or skip
                 targets = [str(t) for t in targets]
 
-        try:
-            # BLEU
-            bleu = sacrebleu.sentence_bleu(actual, targets)
-            item['bleu_score'] = bleu.score
-
-            # chrF (character n-gram F-score) - default is 6-grams
-            chrf = sacrebleu.sentence_chrf(actual, targets)
-            item['chrF_score'] = chrf.score
+        batch.append({'actual': actual, 'targets': targets})
+        batch_items.append(item)
 
-            # chrF++ (word n-grams included) - typically word_order=2
-            chrf_plus = sacrebleu.sentence_chrf(actual, targets, word_order=2)
-            item['chrF_plus_score'] = chrf_plus.score
-
-            # TER (Translation Edit Rate)
-            ter = sacrebleu.sentence_ter(actual, targets)
-            item['ter_test'] = ter.score
-            
-            updated_count += 1
-            
-        except Exception as e:
-            print(f"Error computing metrics for row {item.get('row', 'unknown')} in {json_file_path}: {e}")
+    updated_count = 0
+    for item, scores in zip(batch_items, score_batch(batch)):
+        if 'error' in scores:
+            print(f"Error computing metrics for row {item.get('row', 'unknown')} in {json_file_path}: {scores['error']}")
+            continue
+        item.update(scores)
+        updated_count += 1
 
     if updated_count > 0:
         try:
@@ -81,14 +171,20 @@ def compute_metrics(json_file_path):
 def main():
     parser = argparse.ArgumentParser(description='Compute translation metrics for specified models.')
     parser.add_argument('models', nargs='*', help='List of model names (directories) to compute metrics for. If empty, computes for all.')
+    parser.add_argument('--rebuild-index', action='store_true', help='Ignore the saved reference index and rebuild it.')
     args = parser.parse_args()
 
-    cleaned_data_dir = os.path.join('/home/ninin/projects/Research', 'cleaned_data')
+    cleaned_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cleaned_data')
     
     if not os.path.exists(cleaned_data_dir):
         print(f"Directory '{cleaned_data_dir}' not found.")
         return
 
+    index_path = os.path.join(cleaned_data_dir, REFERENCE_INDEX_FILE)
+    if not args.rebuild_index and not scoring_client.server_available():
+        if get_reference_index().load(index_path):
+            print(f"Loaded reference index from {index_path}")
+
     target_models = args.models if args.models else []
     
     if target_models:
@@ -109,6 +205,13 @@ def main():
                 file_path = os.path.join(root, file)
                 compute_metrics(file_path)
 
+    if _reference_index is None:
+        return
+    try:
+        _reference_index.save(index_path)
+    except Exception as e:
+        print(f"Error writing reference index {index_path}: {e}")
+
 if __name__ == "__main__":
     import argparse
     main()
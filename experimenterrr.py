@@ -5,14 +5,18 @@
 # phi3:14b              few_shot                    TRANSLATION
 # mistral:latest        gramatical_induction
 # llama3:8b             morphological_induction
-# phi3:3.8b             
+# phi3:3.8b
 # llama3.2:1b
+#
+# Hosted models go through the OpenAI-compatible backend, e.g.
+#   --backend openai --base-url <url> --api-key-env <VAR> --model <id> --model-dir gpt5
+# Reasoning models also need --max-tokens-param max_completion_tokens --no-temperature
 
 import argparse
 
 # Configs will be loaded from args
 MODEL_TO_USE = "qwen2.5:14b"
-EXPERIMENT_TYPE = "zero_shot" 
+EXPERIMENT_TYPE = "zero_shot"
 EXPERIMENT_SUBTYPE = "WORD"
 EXPERIMENT_NUMBER = "1"
 
@@ -21,29 +25,51 @@ import json
 import csv
 import os
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
+from inference_backends import OLLAMA_URL, BACKENDS, DEFAULT_TIMEOUT, DEFAULT_MAX_RETRIES, BackendError, OllamaBackend, Scheduler, make_backend
+from run_progress import RunProgress, ProgressLine, serve_metrics
+
+PROMPT_PREAMBLE = """
+            You must rely exclusively on the information provided in the prompt
+            and our current chat history.
+            Do not use any prior knowledge, world knowledge, or external
+            assumptions.
+
+            If a word or rule is not explicitly defined in the prompt, treat it as
+            unknown, but you must still attempt a translation by analogy to the
+            examples provided.
+
+            Never refuse, apologize, explain limitations, or ask questions.
+            Always output a translation, even if incomplete or uncertain.
+
+            Answer with the translation only. No additional text.
+
+            The prompt is:
+            """
+
+# One scheduler per configuration, so latency history (for hedging) and
+# retry/hedge counts carry over between run_ollama calls
+# run_ollama blocks like it always did, also when called from async code
+# such as Jupyter (Scheduler.run then drives its loop from a helper thread)
+_ollama_schedulers = {}
 
 def run_ollama(
     model: str,
     prompt: str,
     temperature: float = 0.0,
     max_tokens: int = 512,
+    timeout: float = DEFAULT_TIMEOUT,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    hedge: bool = False,
 ):
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "options": {
-            "temperature": temperature,
-            "num_predict": max_tokens,
-        },
-        "stream": False,  # IMPORTANT for experiments
-    }
+    key = (model, timeout, max_retries, hedge)
+    scheduler = _ollama_schedulers.get(key)
+    if scheduler is None:
+        scheduler = _ollama_schedulers[key] = Scheduler(
+            OllamaBackend(model, timeout=timeout), max_retries=max_retries, hedge=hedge)
 
     try:
-        response = requests.post(OLLAMA_URL, json=payload)
-        response.raise_for_status()
-        return response.json()["response"]
-    except requests.exceptions.RequestException as e:
+        return scheduler.generate(prompt, temperature, max_tokens).text
+    except (BackendError, requests.exceptions.RequestException) as e:
         print(f"Error calling Ollama: {e}")
         return f"ERROR: {str(e)}"
 
@@ -63,13 +89,27 @@ SUBTYPE_DIR_MAP = {
     "TRANSLATION": "translation_question",
 }
 
-def get_csv_path(model, exp_type, subtype, number):
-    model_dir = MODEL_DIR_MAP.get(model)
+# Hosted-model directories spell it "grammatical_induction"
+EXPERIMENT_TYPE_ALIASES = {
+    "gramatical_induction": "grammatical_induction",
+}
+
+# (type, subtype, number) of every experiment, same order as run_experiments.sh
+EXPERIMENT_SUITE = (
+    [("zero_shot", None, "1")]
+    + [("few_shot", "WORD", str(i)) for i in range(1, 6)]
+    + [("few_shot", "TRANSLATION", str(i)) for i in range(1, 6)]
+    + [("gramatical_induction", None, str(i)) for i in range(1, 6)]
+    + [("morphological_induction", None, "1")]
+)
+
+def get_csv_path(model, exp_type, subtype, number, model_dir=None):
+    model_dir = model_dir or MODEL_DIR_MAP.get(model)
     if not model_dir:
-        raise ValueError(f"Unknown model directory for model: {model}")
+        raise ValueError(f"Unknown model directory for model: {model} (pass --model-dir)")
 
     base_path = os.path.join("Data", model_dir)
-    
+
     if exp_type == "zero_shot":
         return os.path.join(base_path, "zero_shot", f"{number}.csv")
     elif exp_type == "few_shot":
@@ -79,7 +119,131 @@ def get_csv_path(model, exp_type, subtype, number):
         return os.path.join(base_path, "few_shot", subtype_dir, f"{number}.csv")
     else:
         # Fallback for others if they follow simple structure or need more mapping
-        return os.path.join(base_path, exp_type, f"{number}.csv")
+        csv_file_path = os.path.join(base_path, exp_type, f"{number}.csv")
+        alias = EXPERIMENT_TYPE_ALIASES.get(exp_type)
+        if alias and not os.path.exists(csv_file_path):
+            alias_path = os.path.join(base_path, alias, f"{number}.csv")
+            if os.path.exists(alias_path):
+                return alias_path
+        return csv_file_path
+
+def experiment_name(csv_file_path):
+    """Data/<model>/few_shot/word_question/1.csv -> few_shot/word_question/1"""
+    parts = os.path.normpath(os.path.splitext(csv_file_path)[0]).split(os.sep)
+    return "/".join(parts[2:])
+
+
+def load_rows(csv_file_path):
+    """
+    Reads an experiment CSV and returns (fieldnames, rows, delimiter). Most
+    files use ';', the hosted-model ones use ','.
+    """
+    with open(csv_file_path, mode='r', encoding='utf-8') as f:
+        delimiter = ';' if ';' in f.readline() else ','
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter=delimiter)
+        return reader.fieldnames, list(reader), delimiter
+
+def write_rows(csv_file_path, fieldnames, rows, delimiter=';'):
+    with open(csv_file_path, mode='w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def get_prompt(row):
+    prompt = row.get("Prompt", "").strip()
+
+    # Clean prompt quotes if necessary
+    if prompt.startswith('"') and prompt.endswith('"'):
+         prompt = prompt[1:-1]
+    return prompt
+
+def is_done(row):
+    """A row is done once it holds an answer that is not an error marker."""
+    actual = (row.get("Actual Output") or "").strip()
+    return bool(actual) and not actual.startswith("ERROR:")
+
+def prepare_experiment(csv_file_path, resume=False):
+    """
+    Loads one experiment CSV and returns (fieldnames, rows, delimiter, jobs),
+    where jobs are the (row index, full prompt) pairs still to run. With
+    `resume`, rows that already have an answer are skipped.
+    """
+    fieldnames, rows, delimiter = load_rows(csv_file_path)
+
+    jobs = []
+    for i, row in enumerate(rows):
+        prompt = get_prompt(row)
+        if not prompt:
+            continue
+        if resume and is_done(row):
+            continue
+        jobs.append((i, PROMPT_PREAMBLE + prompt))
+
+    return fieldnames, rows, delimiter, jobs
+
+def run_experiments(backend, csv_file_paths, resume=False, checkpoint_every=10, progress=None, verbose=False,
+                    max_retries=DEFAULT_MAX_RETRIES, hedge=False):
+    """
+    Runs every prompt of the given experiment CSVs through `backend`, one
+    file after the other, and writes the answers to the "Actual Output"
+    column. All files are loaded up front so `progress` knows the size of
+    the whole sweep. The CSV is rewritten every `checkpoint_every` completed
+    rows so an interrupted sweep can be resumed. Per-prompt output is only
+    printed with `verbose`. Retryable failures are retried up to
+    `max_retries` times and, with `hedge`, slow requests are duplicated.
+    """
+    # Through the progress display when there is one, so the live line is not broken
+    log = progress.log if progress else print
+
+    prepared = []
+    for csv_file_path in csv_file_paths:
+        fieldnames, rows, delimiter, jobs = prepare_experiment(csv_file_path, resume)
+        name = experiment_name(csv_file_path)
+        log(f"Loaded {len(rows)} rows from {csv_file_path}" + (f", {len(jobs)} left to run" if resume else ""))
+        if progress:
+            progress.add_experiment(name, len(jobs))
+        prepared.append((csv_file_path, name, fieldnames, rows, delimiter, jobs))
+
+    scheduler = Scheduler(backend, max_retries=max_retries, hedge=hedge, progress=progress)
+
+    try:
+        for csv_file_path, name, fieldnames, rows, delimiter, jobs in prepared:
+            if progress:
+                progress.start_experiment(name)
+            completed = 0
+
+            def on_result(i, result):
+                nonlocal completed
+                error = isinstance(result, BackendError)
+                if error:
+                    log(f"Error calling {backend.name} ({name} row {i+2}): {result}")
+                    response_text = f"ERROR: {str(result)}"
+                else:
+                    response_text = result.text
+
+                if verbose:
+                    print(f"\n[{i+1}/{len(rows)}] Processing Prompt: {get_prompt(rows[i])}") # Truncate log
+                    print(f"Result: {response_text}") # Truncate log
+                rows[i]["Actual Output"] = response_text
+                if progress:
+                    progress.row_done(name, error)
+
+                completed += 1
+                if checkpoint_every and completed % checkpoint_every == 0:
+                    write_rows(csv_file_path, fieldnames, rows, delimiter)
+
+            scheduler.run(jobs, on_result)
+
+            # Write back to CSV
+            write_rows(csv_file_path, fieldnames, rows, delimiter)
+            if verbose:
+                print(f"\nUpdated {csv_file_path} with results.")
+    finally:
+        # Drops requests that lost a hedge race instead of waiting for them
+        scheduler.close()
+
+    log(f"Requests: {scheduler.summary()}")
 
 
 if __name__ == "__main__":
@@ -88,81 +252,69 @@ if __name__ == "__main__":
     parser.add_argument("--type", type=str, default=EXPERIMENT_TYPE, help="Experiment type (e.g., zero_shot, few_shot)")
     parser.add_argument("--subtype", type=str, default=EXPERIMENT_SUBTYPE, help="Experiment subtype (e.g., WORD, TRANSLATION)")
     parser.add_argument("--number", type=str, default=EXPERIMENT_NUMBER, help="Experiment number (e.g., 1)")
-    
+    parser.add_argument("--backend", type=str, default="ollama", choices=sorted(BACKENDS), help="Inference backend")
+    parser.add_argument("--base-url", type=str, default=None, help=f"Backend URL (default: {OLLAMA_URL} for ollama, the OpenAI API for openai)")
+    parser.add_argument("--api-key-env", type=str, default="OPENAI_API_KEY", help="Environment variable holding the API key (openai backend)")
+    parser.add_argument("--max-tokens-param", type=str, default="max_tokens", help="Token-limit field for the openai backend (max_completion_tokens for reasoning models)")
+    parser.add_argument("--no-temperature", action="store_true", help="Leave temperature out of openai requests (reasoning models only accept the default)")
+    parser.add_argument("--model-dir", type=str, default=None, help="Directory under Data/ for models missing from MODEL_DIR_MAP (e.g., gpt5)")
+    parser.add_argument("--concurrency", type=int, default=None, help="Max in-flight requests (default: 1 for ollama, 4 for openai)")
+    parser.add_argument("--rate", type=float, default=None, help="Max requests per second (default: unlimited)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-request deadline in seconds")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES, help="Retries for timeouts, dropped connections, 429 and 5xx (jittered exponential backoff)")
+    parser.add_argument("--hedge", action="store_true", help="Send a duplicate request when one runs longer than the observed p95 latency")
+    parser.add_argument("--resume", action="store_true", help="Skip rows that already have a non-error Actual Output")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="Rewrite the CSV after this many completed rows (0 to only write at the end)")
+    parser.add_argument("--suite", action="store_true", help="Run every experiment (as run_experiments.sh does) in this process; --type/--subtype/--number are ignored")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on http://127.0.0.1:<port>/metrics")
+    parser.add_argument("--verbose", action="store_true", help="Print every prompt and answer instead of the single progress line")
+
     args = parser.parse_args()
-    
+
     MODEL_TO_USE = args.model
     EXPERIMENT_TYPE = args.type
     EXPERIMENT_SUBTYPE = args.subtype
     EXPERIMENT_NUMBER = args.number
 
     try:
-        csv_file_path = get_csv_path(MODEL_TO_USE, EXPERIMENT_TYPE, EXPERIMENT_SUBTYPE, EXPERIMENT_NUMBER)
+        if args.suite:
+            csv_file_paths = [get_csv_path(MODEL_TO_USE, t, st, n, args.model_dir) for t, st, n in EXPERIMENT_SUITE]
+        else:
+            csv_file_paths = [get_csv_path(MODEL_TO_USE, EXPERIMENT_TYPE, EXPERIMENT_SUBTYPE, EXPERIMENT_NUMBER, args.model_dir)]
+        backend = make_backend(args.backend, MODEL_TO_USE, args.base_url, args.api_key_env, args.concurrency, args.rate, args.timeout,
+                               args.max_tokens_param, not args.no_temperature)
     except ValueError as e:
         print(e)
         exit(1)
-    
-    print(f"Using Config: Model={MODEL_TO_USE}, Type={EXPERIMENT_TYPE}, Subtype={EXPERIMENT_SUBTYPE}, Number={EXPERIMENT_NUMBER}")
-    print(f"Target File: {csv_file_path}")
+
+    if args.suite:
+        print(f"Using Config: Model={MODEL_TO_USE}, Suite of {len(csv_file_paths)} experiments, Backend={backend.name}")
+    else:
+        print(f"Using Config: Model={MODEL_TO_USE}, Type={EXPERIMENT_TYPE}, Subtype={EXPERIMENT_SUBTYPE}, Number={EXPERIMENT_NUMBER}, Backend={backend.name}")
+        print(f"Target File: {csv_file_paths[0]}")
 
     # Check if file exists
-    if not os.path.exists(csv_file_path):
+    missing = [p for p in csv_file_paths if not os.path.exists(p)]
+    for csv_file_path in missing:
         print(f"Error: File not found at {csv_file_path}")
+    if missing and not args.suite:
         exit(1)
+    csv_file_paths = [p for p in csv_file_paths if p not in missing]
 
-    rows = []
-    fieldnames = []
-
-    # Read the CSV
-    with open(csv_file_path, mode='r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter=';')
-        fieldnames = reader.fieldnames
-        for row in reader:
-            rows.append(row)
-
-    print(f"Loaded {len(rows)} rows from {csv_file_path}")
-
-    # Process each row
-    for i, row in enumerate(rows):
-        prompt = row.get("Prompt", "").strip()
-        
-        # Clean prompt quotes if necessary
-        if prompt.startswith('"') and prompt.endswith('"'):
-             prompt = prompt[1:-1]
-
-        if not prompt:
-            continue
-
-        print(f"\n[{i+1}/{len(rows)}] Processing Prompt: {prompt}") # Truncate log
+    progress = RunProgress(MODEL_TO_USE)
+    if args.metrics_port:
+        serve_metrics(progress, args.metrics_port)
+        print(f"Serving metrics on http://127.0.0.1:{args.metrics_port}/metrics")
 
-        response_text = run_ollama(
-            model=MODEL_TO_USE, 
-            prompt="""
-            You must rely exclusively on the information provided in the prompt
-            and our current chat history.
-            Do not use any prior knowledge, world knowledge, or external
-            assumptions.
-
-            If a word or rule is not explicitly defined in the prompt, treat it as
-            unknown, but you must still attempt a translation by analogy to the
-            examples provided.
-
-            Never refuse, apologize, explain limitations, or ask questions.
-            Always output a translation, even if incomplete or uncertain.
-
-            Answer with the translation only. No additional text.
-
-            The prompt is:
-            """ + prompt
-        )
-        print(f"Result: {response_text}") # Truncate log
-        
-        row["Actual Output"] = response_text
-
-    # Write back to CSV
-    with open(csv_file_path, mode='w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';', quoting=csv.QUOTE_MINIMAL)
-        writer.writeheader()
-        writer.writerows(rows)
+    progress_line = None
+    if not args.verbose:
+        progress_line = ProgressLine(progress)
+        progress_line.start()
+    try:
+        run_experiments(backend, csv_file_paths, args.resume, args.checkpoint_every, progress, args.verbose,
+                        args.max_retries, args.hedge)
+    finally:
+        if progress_line:
+            progress_line.close()
 
-    print(f"\nUpdated {csv_file_path} with results.")
+    print(f"Updated {len(csv_file_paths)} file(s) with results.")
@@ -0,0 +1,484 @@
+import asyncio
+import os
+import random
+import time
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+OLLAMA_URL = "http://localhost:11434/api/generate"
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+# Status codes worth retrying: rate limited or server-side trouble
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Per-request deadline in seconds; long generations on a local GPU fit well within it
+DEFAULT_TIMEOUT = 300.0
+DEFAULT_MAX_RETRIES = 5
+
+Completion = namedtuple("Completion", ["text", "completion_tokens"])
+
+
+class BackendError(Exception):
+    """
+    Raised by a backend when a request fails. `retryable` tells the scheduler
+    whether to back off and try again; `retry_after` is the server's hint in
+    seconds, if it sent one. `timed_out` marks requests that hit their deadline.
+    """
+
+    def __init__(self, message, retryable=False, retry_after=None, timed_out=False):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.timed_out = timed_out
+
+
+def _post(url, payload, timeout, headers=None):
+    """requests.post with a deadline; timeouts and dropped connections are retryable."""
+    try:
+        return requests.post(url, json=payload, headers=headers, timeout=timeout)
+    except requests.exceptions.Timeout as e:
+        raise BackendError(f"Timed out after {timeout}s: {e}", retryable=True, timed_out=True)
+    except requests.exceptions.ConnectionError as e:
+        raise BackendError(f"Connection failed: {e}", retryable=True)
+
+
+def _raise_for_response(response):
+    if response.status_code < 400:
+        return
+    retry_after = response.headers.get("Retry-After")
+    try:
+        retry_after = float(retry_after) if retry_after is not None else None
+    except ValueError:
+        retry_after = None
+    raise BackendError(
+        f"HTTP {response.status_code}: {response.text[:200]}",
+        retryable=response.status_code in RETRYABLE_STATUS,
+        retry_after=retry_after,
+    )
+
+
+class Backend:
+    """
+    A model endpoint. Subclasses implement `generate`, which is blocking and
+    returns a `Completion`; the scheduler runs it in worker threads.
+
+    `concurrency` bounds in-flight requests, `rate` (requests per second,
+    None for unlimited) feeds the token bucket and `timeout` is the
+    per-request deadline in seconds.
+    """
+
+    name = "backend"
+
+    def __init__(self, model, concurrency=1, rate=None, timeout=DEFAULT_TIMEOUT):
+        self.model = model
+        self.concurrency = concurrency
+        self.rate = rate
+        self.timeout = timeout
+
+    def generate(self, prompt, temperature=0.0, max_tokens=512):
+        raise NotImplementedError
+
+
+class OllamaBackend(Backend):
+    """Local Ollama server, /api/generate."""
+
+    name = "ollama"
+
+    def __init__(self, model, url=OLLAMA_URL, concurrency=1, rate=None, timeout=DEFAULT_TIMEOUT):
+        super().__init__(model, concurrency, rate, timeout)
+        self.url = url
+
+    def generate(self, prompt, temperature=0.0, max_tokens=512):
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens,
+            },
+            "stream": False,  # IMPORTANT for experiments
+        }
+        response = _post(self.url, payload, self.timeout)
+        _raise_for_response(response)
+        body = response.json()
+        return Completion(body["response"], body.get("eval_count"))
+
+
+class OpenAIChatBackend(Backend):
+    """
+    Any OpenAI-compatible chat completions endpoint (hosted APIs, gateways,
+    vLLM, Ollama's /v1, or a local stand-in server for testing).
+
+    Reasoning models reject `max_tokens` and any non-default temperature, so
+    `max_tokens_param` names the token-limit field (e.g. max_completion_tokens)
+    and `send_temperature=False` leaves temperature out of the request.
+    """
+
+    name = "openai"
+
+    def __init__(self, model, base_url=OPENAI_BASE_URL, api_key=None, concurrency=4, rate=None, timeout=DEFAULT_TIMEOUT,
+                 max_tokens_param="max_tokens", send_temperature=True):
+        super().__init__(model, concurrency, rate, timeout)
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.api_key = api_key
+        self.max_tokens_param = max_tokens_param
+        self.send_temperature = send_temperature
+
+    def generate(self, prompt, temperature=0.0, max_tokens=512):
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            self.max_tokens_param: max_tokens,
+        }
+        if self.send_temperature and temperature is not None:
+            payload["temperature"] = temperature
+        headers = {}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        response = _post(self.url, payload, self.timeout, headers)
+        _raise_for_response(response)
+        body = response.json()
+        usage = body.get("usage") or {}
+        return Completion(body["choices"][0]["message"]["content"], usage.get("completion_tokens"))
+
+
+BACKENDS = {
+    OllamaBackend.name: OllamaBackend,
+    OpenAIChatBackend.name: OpenAIChatBackend,
+}
+
+
+def make_backend(name, model, base_url=None, api_key_env=None, concurrency=None, rate=None, timeout=DEFAULT_TIMEOUT,
+                 max_tokens_param=None, send_temperature=True):
+    """Builds a backend from command-line style options; the last two only apply to openai."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name} (choose from {sorted(BACKENDS)})")
+
+    kwargs = {"rate": rate, "timeout": timeout}
+    if concurrency:
+        kwargs["concurrency"] = concurrency
+    if name == OllamaBackend.name:
+        if base_url:
+            kwargs["url"] = base_url
+    else:
+        if base_url:
+            kwargs["base_url"] = base_url
+        kwargs["api_key"] = os.environ.get(api_key_env) if api_key_env else None
+        if max_tokens_param:
+            kwargs["max_tokens_param"] = max_tokens_param
+        kwargs["send_temperature"] = send_temperature
+    return BACKENDS[name](model, **kwargs)
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second up to `burst`. `pause` blocks
+    all callers until a server-provided deadline (e.g. a 429 Retry-After).
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                if self.rate is None:
+                    return
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LatencyTracker:
+    """
+    Rolling window of request latencies, for the hedging delay. Requests that
+    lost a hedge race are added with the time they had run when dropped (a
+    lower bound), so slow requests are not left out of the tail.
+    """
+
+    def __init__(self, window=200, min_samples=20):
+        self.latencies = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def add(self, latency):
+        self.latencies.append(latency)
+
+    def quantile(self, q):
+        """The q-quantile, or None until enough requests have been observed."""
+        if len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Request:
+    """One request to the backend and the slot it holds until its thread returns."""
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.start = None
+        self.returned = False
+
+
+class Scheduler:
+    """
+    Runs prompts against one backend with bounded concurrency, a token-bucket
+    rate limit and jittered exponential backoff on retryable errors (429/5xx,
+    timeouts, dropped connections).
+
+    With `hedge`, a request still running after the observed `hedge_quantile`
+    latency gets a duplicate; whichever answers first wins. Hedges go through
+    the token bucket and have their own `concurrency` slots, and at most a
+    `hedge_budget` fraction of requests is hedged. A losing request cannot be
+    interrupted, so it keeps its slot until its thread returns: at most
+    `concurrency` extra requests are ever in flight.
+
+    The event loop and worker threads live as long as the scheduler, so a
+    dropped request never holds up `run` or `generate`; call `close` when done.
+    """
+
+    def __init__(self, backend, max_retries=DEFAULT_MAX_RETRIES, backoff_base=1.0, backoff_cap=60.0,
+                 hedge=False, hedge_quantile=0.95, hedge_budget=0.1, progress=None):
+        self.backend = backend
+        self.progress = progress
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self.latency = LatencyTracker()
+        self.requests = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.loop = None
+        self.executor = None
+        self.bucket = None
+        self.slots = None
+        self.hedge_slots = None
+
+    def log(self, message):
+        # Through the progress display, so the live line is not broken
+        if self.progress:
+            self.progress.log(message)
+        else:
+            print(message)
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _finished(self, request, future):
+        # Called in the loop once the request's thread has returned
+        request.returned = True
+        request.slots.release()
+        if self.progress and request.start is not None:
+            completion = None if future.cancelled() or future.exception() else future.result()
+            self.progress.request_finished(
+                time.monotonic() - request.start, completion.completion_tokens if completion else None)
+
+    async def _send(self, request, prompt, temperature, max_tokens):
+        """Sends one request; its slot is already held and the token bucket passed."""
+        loop = asyncio.get_running_loop()
+        request.start = time.monotonic()
+        if self.progress:
+            self.progress.request_started()
+        future = self.executor.submit(self.backend.generate, prompt, temperature, max_tokens)
+        # Registered before wrap_future's own callback, so the slot is free
+        # by the time the awaiting coroutine resumes
+        future.add_done_callback(lambda f: _call_in_loop(loop, self._finished, request, f))
+        result = asyncio.wrap_future(future, loop=loop)
+        try:
+            completion = await result
+        except requests.exceptions.RequestException as e:
+            raise BackendError(str(e))
+        except (KeyError, IndexError, ValueError) as e:
+            raise BackendError(f"Malformed response: {e!r}")
+        self.latency.add(time.monotonic() - request.start)
+        return completion
+
+    async def _send_hedge(self, request, prompt, temperature, max_tokens):
+        try:
+            await self.bucket.acquire()
+        except asyncio.CancelledError:
+            # Dropped before it was sent
+            request.slots.release()
+            raise
+        return await self._send(request, prompt, temperature, max_tokens)
+
+    def _may_hedge(self):
+        return (not self.hedge_slots.locked()
+                and self.hedges < self.hedge_budget * self.requests)
+
+    async def _drop(self, request, task):
+        """Cancels a request that lost the race; its thread runs on and frees its slot when it returns."""
+        task.cancel()
+        if request.start is None:
+            return
+        self.latency.add(time.monotonic() - request.start)
+        # If its thread already returned (answer not yet read), _finished has
+        # released its slot and there is nothing to hand over
+        if not request.returned and request.slots is self.slots and not self.hedge_slots.locked():
+            # Count the orphan against the hedge slots so the next prompt
+            # does not wait for an answer nobody will read
+            await self.hedge_slots.acquire()
+            request.slots = self.hedge_slots
+            self.slots.release()
+
+    async def _hedged_attempt(self, prompt, temperature, max_tokens):
+        """
+        Sends one request and, if it is slower than the hedge delay, races a
+        duplicate against it. Fails only if every copy fails.
+        """
+        await self.slots.acquire()
+        primary = _Request(self.slots)
+        try:
+            await self.bucket.acquire()
+        except asyncio.CancelledError:
+            self.slots.release()
+            raise
+        self.requests += 1
+        primary_task = asyncio.ensure_future(self._send(primary, prompt, temperature, max_tokens))
+
+        hedge_delay = self.latency.quantile(self.hedge_quantile) if self.hedge else None
+        if hedge_delay is None:
+            return await primary_task
+        done, _ = await asyncio.wait({primary_task}, timeout=hedge_delay)
+        if done or not self._may_hedge():
+            return await primary_task
+
+        await self.hedge_slots.acquire()
+        self.hedges += 1
+        if self.progress:
+            self.progress.hedged()
+        hedge = _Request(self.hedge_slots)
+        hedge_task = asyncio.ensure_future(self._send_hedge(hedge, prompt, temperature, max_tokens))
+
+        requests_by_task = {primary_task: primary, hedge_task: hedge}
+        pending = set(requests_by_task)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        await self._drop(requests_by_task[other], other)
+                    if task is hedge_task:
+                        self.hedge_wins += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    async def _generate(self, prompt, temperature, max_tokens):
+        attempt = 0
+        while True:
+            try:
+                return await self._hedged_attempt(prompt, temperature, max_tokens)
+            except BackendError as e:
+                error = e
+
+            if error.timed_out:
+                self.timeouts += 1
+            if not error.retryable or attempt >= self.max_retries:
+                raise error
+
+            delay = self.backoff_delay(attempt, error.retry_after)
+            if error.retry_after is not None:
+                self.bucket.pause(error.retry_after)
+            attempt += 1
+            self.retries += 1
+            if self.progress:
+                self.progress.retried()
+            self.log(f"Retrying in {delay:.1f}s after: {error}")
+            await asyncio.sleep(delay)
+
+    async def _run(self, jobs, on_result, temperature, max_tokens):
+        if self.slots is None:
+            # Created inside the loop they will be used from; bounded so a
+            # double release raises instead of silently raising the cap
+            self.bucket = TokenBucket(self.backend.rate, burst=self.backend.concurrency)
+            self.slots = asyncio.BoundedSemaphore(self.backend.concurrency)
+            self.hedge_slots = asyncio.BoundedSemaphore(self.backend.concurrency)
+
+        async def run_job(key, prompt):
+            try:
+                result = await self._generate(prompt, temperature, max_tokens)
+            except BackendError as e:
+                result = e
+            on_result(key, result)
+
+        await asyncio.gather(*(run_job(key, prompt) for key, prompt in jobs))
+
+    def run(self, jobs, on_result, temperature=0.0, max_tokens=512):
+        """
+        Runs `jobs`, an iterable of (key, prompt), and calls
+        `on_result(key, Completion or BackendError)` as each one finishes.
+        Blocks until they are done, also when called from async code.
+        """
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            # One thread per slot, so a request never queues behind a dropped one
+            workers = self.backend.concurrency * (2 if self.hedge else 1)
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+        run = self._run(list(jobs), on_result, temperature, max_tokens)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop.run_until_complete(run)
+            return
+        # This thread already runs a loop (Jupyter, an async caller), which
+        # cannot be nested; block on ours from a helper thread instead
+        with ThreadPoolExecutor(max_workers=1) as helper:
+            helper.submit(self.loop.run_until_complete, run).result()
+
+    def generate(self, prompt, temperature=0.0, max_tokens=512):
+        """Blocking single request with the same deadlines, retries and hedging."""
+        results = []
+        self.run([(0, prompt)], lambda key, result: results.append(result), temperature, max_tokens)
+        if isinstance(results[0], BackendError):
+            raise results[0]
+        return results[0]
+
+    def close(self):
+        """Stops the loop and drops queued work without waiting for requests that lost a hedge race."""
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.loop:
+            self.loop.close()
+        self.loop = self.executor = None
+        self.bucket = self.slots = self.hedge_slots = None
+
+    def summary(self):
+        """One line describing the retries, timeouts and hedges that fired."""
+        return (f"{self.retries} retries ({self.timeouts} timeouts), "
+                f"{self.hedges} hedges ({self.hedge_wins} won by the hedge)")
+
+
+def _call_in_loop(loop, callback, *args):
+    # From a worker thread; the loop may already be closed if the scheduler was
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        pass
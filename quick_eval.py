@@ -0,0 +1,320 @@
+import os
+import re
+import json
+import math
+import hashlib
+import argparse
+
+from experimenterrr import (
+    MODEL_DIR_MAP, EXPERIMENT_SUITE, OLLAMA_URL, BACKENDS,
+    get_csv_path, load_rows, write_rows, get_prompt, is_done, run_experiments,
+)
+from inference_backends import DEFAULT_TIMEOUT, DEFAULT_MAX_RETRIES, make_backend
+from run_progress import RunProgress, ProgressLine
+from clean_all_data import clean_target, clean_actual, canonical_category
+from compute_translation_metrics import score_translation
+from compute_match_metrics import compute_match_scores
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CLEANED_DATA_DIR = os.path.join(BASE_DIR, 'cleaned_data')
+OUTPUT_DIR = 'quick_eval'
+
+METRICS = [
+    'bleu_score', 'chrF_score', 'chrF_plus_score', 'ter_test',
+    'exact_match', 'token_f1', 'char_edit_distance', 'bert_score_f1',
+]
+
+# Ranked ascending in the comparison table
+LOWER_IS_BETTER = {'ter_test', 'char_edit_distance'}
+
+# 95% normal interval
+Z = 1.96
+
+# Estimates are withheld when more of the sample than this failed to run
+# (ERROR or empty answers): that is an infrastructure problem, not a score
+MAX_FAILED_FRACTION = 0.05
+
+def stratum_key(csv_relpath):
+    """
+    few_shot/word_question/1.csv -> few_shot/word_question/1, with the
+    hosted-model spelling of grammatical_induction folded in.
+    """
+    return canonical_category(os.path.splitext(csv_relpath)[0].replace(os.sep, '/'))
+
+def sample_rows(population, fraction, seed, min_per_stratum=1):
+    """
+    Deterministic stratified sample. `population` maps each stratum to its
+    row indices; each row is ranked by a hash of (seed, stratum, row) and
+    the first ceil(fraction * N_h) rows of every stratum are kept, so the
+    same seed always picks the same rows for every model.
+    """
+    sample = {}
+    for stratum, rows in population.items():
+        n = min(len(rows), max(min_per_stratum, math.ceil(fraction * len(rows))))
+        ranked = sorted(rows, key=lambda i: hashlib.sha1(f"{seed}|{stratum}|{i}".encode('utf-8')).hexdigest())
+        sample[stratum] = sorted(ranked[:n])
+    return sample
+
+def stratified_estimate(values, population_sizes):
+    """
+    Stratified mean with a 95% confidence half-width.
+
+    `values` maps stratum -> list of sampled values. Uses
+    var = sum(W_h^2 * (1 - n_h/N_h) * s_h^2 / n_h); strata with a single
+    sampled row borrow the pooled variance of the whole sample.
+    """
+    strata = [h for h, v in values.items() if v]
+    if not strata:
+        return None
+    total = sum(population_sizes[h] for h in strata)
+
+    pooled = [x for h in strata for x in values[h]]
+    pooled_mean = sum(pooled) / len(pooled)
+    pooled_var = sum((x - pooled_mean) ** 2 for x in pooled) / (len(pooled) - 1) if len(pooled) > 1 else 0.0
+
+    mean = 0.0
+    var = 0.0
+    for h in strata:
+        v = values[h]
+        n_h, N_h = len(v), population_sizes[h]
+        w_h = N_h / total
+        m_h = sum(v) / n_h
+        s2_h = sum((x - m_h) ** 2 for x in v) / (n_h - 1) if n_h > 1 else pooled_var
+        mean += w_h * m_h
+        var += w_h ** 2 * (1 - n_h / N_h) * s2_h / n_h
+
+    return {'mean': mean, 'ci': Z * math.sqrt(var), 'n': len(pooled)}
+
+def load_population(prompts_from):
+    """
+    Reads the prompt CSVs of a reference model directory. Returns
+    {stratum: (csv_path, fieldnames, rows, delimiter, row_indices)}.
+    """
+    population = {}
+    for exp_type, subtype, number in EXPERIMENT_SUITE:
+        csv_file_path = get_csv_path(None, exp_type, subtype, number, prompts_from)
+        if not os.path.exists(csv_file_path):
+            print(f"Skipping missing {csv_file_path}")
+            continue
+        fieldnames, rows, delimiter = load_rows(csv_file_path)
+        relpath = os.path.relpath(csv_file_path, os.path.join('Data', prompts_from))
+        indices = [i for i, row in enumerate(rows) if get_prompt(row)]
+        population[stratum_key(relpath)] = (relpath, fieldnames, rows, delimiter, indices)
+    return population
+
+def write_sample(population, sample, model_dir, output_dir):
+    """
+    Writes the sampled rows of each experiment to
+    <output_dir>/<model_dir>/<experiment>.csv, keeping answers from an
+    earlier quick-eval of the same sample so reruns resume.
+    """
+    paths = []
+    for stratum, (relpath, fieldnames, rows, delimiter, _) in population.items():
+        path = os.path.join(output_dir, model_dir, relpath)
+        previous = {}
+        if os.path.exists(path):
+            _, old_rows, _ = load_rows(path)
+            previous = {row.get('Source Row'): row.get('Actual Output', '') for row in old_rows}
+
+        sampled = []
+        for i in sample[stratum]:
+            row = dict(rows[i])
+            row['Source Row'] = str(i + 2)
+            row['Actual Output'] = previous.get(row['Source Row'], '')
+            sampled.append(row)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_rows(path, list(fieldnames) + ['Source Row'], sampled, delimiter)
+        paths.append(path)
+    return paths
+
+def score_sample(paths, output_dir, model_dir, bert=False):
+    """
+    Cleans the quick-eval answers like clean_all_data.py and scores them
+    like the metric scripts. Rows that did not get an answer (ERROR or
+    empty) are left out. Returns ({stratum: [item, ...]}, {stratum: failed}).
+    """
+    items_by_stratum = {}
+    failed_by_stratum = {}
+    all_items = []
+    for path in paths:
+        _, rows, _ = load_rows(path)
+        stratum = stratum_key(os.path.relpath(path, os.path.join(output_dir, model_dir)))
+        items = []
+        failed_by_stratum[stratum] = 0
+        for row in rows:
+            if not is_done(row):
+                failed_by_stratum[stratum] += 1
+                continue
+            items.append({
+                'row': int(row['Source Row']),
+                'targets': clean_target(row.get('Target Output') or ''),
+                'actual': clean_actual(row.get('Actual Output') or ''),
+            })
+        items_by_stratum[stratum] = items
+        all_items.extend(items)
+
+    for item in all_items:
+        if item['targets']:
+            item.update(score_translation(item['actual'], item['targets']))
+    for item, scores in zip(all_items, compute_match_scores(all_items)):
+        if scores:
+            item.update(scores)
+
+    if bert:
+        from compute_bert_score import bert_scores
+        scored = [item for item in all_items if item['targets']]
+        _, _, F1 = bert_scores([item['actual'] for item in scored], [item['targets'] for item in scored])
+        for item, f1 in zip(scored, F1):
+            item['bert_score_f1'] = f1
+
+    return items_by_stratum, failed_by_stratum
+
+def load_full_runs(models, strata):
+    """
+    Stored per-row metrics of full runs under cleaned_data, as
+    {model: {stratum: {row: item}}}.
+    """
+    runs = {}
+    for model in models:
+        model_dir = os.path.join(CLEANED_DATA_DIR, model)
+        by_stratum = {}
+        for root, _, files in os.walk(model_dir):
+            for file in files:
+                if not file.endswith('.json'):
+                    continue
+                stratum = stratum_key(os.path.relpath(os.path.join(root, file), model_dir))
+                if stratum not in strata:
+                    continue
+                with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
+                    by_stratum[stratum] = {item.get('row'): item for item in json.load(f)}
+        runs[model] = by_stratum
+    return runs
+
+def summarize(items_by_stratum, sample, population_sizes, full_runs):
+    """Per-metric estimate for the candidate and full/same-sample means for the others."""
+    summary = {}
+    for metric in METRICS:
+        values = {h: [item[metric] for item in items if metric in item] for h, items in items_by_stratum.items()}
+        estimate = stratified_estimate(values, population_sizes)
+        if estimate is None:
+            continue
+
+        others = {}
+        for model, by_stratum in full_runs.items():
+            full = [item[metric] for rows in by_stratum.values() for item in rows.values() if metric in item]
+            same_sample = {h: [rows[i + 2][metric] for i in sample[h] if i + 2 in rows and metric in rows[i + 2]]
+                           for h, rows in by_stratum.items()}
+            sample_estimate = stratified_estimate(same_sample, population_sizes)
+            if full:
+                others[model] = {
+                    'full_mean': sum(full) / len(full),
+                    'full_n': len(full),
+                    'sample_mean': sample_estimate['mean'] if sample_estimate else None,
+                }
+        summary[metric] = {'estimate': estimate, 'others': others}
+    return summary
+
+def print_summary(model, summary):
+    for metric, result in summary.items():
+        estimate = result['estimate']
+        print(f"\n{metric}: {model} = {estimate['mean']:.3f} ± {estimate['ci']:.3f} (n={estimate['n']})")
+        ranked = sorted(result['others'].items(), key=lambda kv: kv[1]['full_mean'], reverse=metric not in LOWER_IS_BETTER)
+        for other, stats in ranked:
+            sample_mean = f"{stats['sample_mean']:.3f}" if stats['sample_mean'] is not None else 'n/a'
+            inside = abs(stats['full_mean'] - estimate['mean']) <= estimate['ci']
+            print(f"  {other:<12} full {stats['full_mean']:8.3f} (n={stats['full_n']:>3})  same sample {sample_mean:>8}"
+                  + ("  ~ within CI" if inside else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description='Quick-eval a model on a deterministic stratified sample of rows, with confidence intervals.')
+    parser.add_argument('--model', required=True, help='Model to evaluate (e.g., qwen2.5:14b)')
+    parser.add_argument('--model-dir', default=None, help='Output directory name for the model (default: MODEL_DIR_MAP entry or a sanitized model name)')
+    parser.add_argument('--fraction', type=float, default=0.2, help='Fraction of rows to sample from every experiment file')
+    parser.add_argument('--min-per-stratum', type=int, default=2, help='Minimum rows sampled from every experiment file')
+    parser.add_argument('--seed', default='quick-eval', help='Sampling seed; the same seed picks the same rows for every model')
+    parser.add_argument('--prompts-from', default='qwen_14b', help='Data/ directory to read prompts and targets from')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='Where sampled CSVs and the report are written (Data/ is never touched)')
+    parser.add_argument('--compare', nargs='*', default=None, help='cleaned_data models to compare against (default: all)')
+    parser.add_argument('--bert', action='store_true', help='Also estimate BERTScore F1 (slow unless scoring_server.py is running)')
+    parser.add_argument('--max-failed-fraction', type=float, default=MAX_FAILED_FRACTION, help='Withhold estimates when more of the sample than this got no answer (ERROR or empty)')
+    parser.add_argument('--no-run', action='store_true', help='Only (re)score answers from an earlier quick-eval')
+    parser.add_argument('--backend', type=str, default='ollama', choices=sorted(BACKENDS), help='Inference backend')
+    parser.add_argument('--base-url', type=str, default=None, help=f'Backend URL (default: {OLLAMA_URL} for ollama, the OpenAI API for openai)')
+    parser.add_argument('--api-key-env', type=str, default='OPENAI_API_KEY', help='Environment variable holding the API key (openai backend)')
+    parser.add_argument('--max-tokens-param', type=str, default='max_tokens', help='Token-limit field for the openai backend (max_completion_tokens for reasoning models)')
+    parser.add_argument('--no-temperature', action='store_true', help='Leave temperature out of openai requests (reasoning models only accept the default)')
+    parser.add_argument('--concurrency', type=int, default=None, help='Max in-flight requests')
+    parser.add_argument('--rate', type=float, default=None, help='Max requests per second')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='Per-request deadline in seconds')
+    parser.add_argument('--max-retries', type=int, default=DEFAULT_MAX_RETRIES, help='Retries for timeouts, dropped connections, 429 and 5xx')
+    parser.add_argument('--hedge', action='store_true', help='Send a duplicate request when one runs longer than the observed p95 latency')
+    args = parser.parse_args()
+
+    model_dir = args.model_dir or MODEL_DIR_MAP.get(args.model) or re.sub(r'[^\w.-]+', '_', args.model)
+
+    population = load_population(args.prompts_from)
+    if not population:
+        print(f"No prompt CSVs found under Data/{args.prompts_from}")
+        return
+    population_sizes = {h: len(p[4]) for h, p in population.items()}
+    sample = sample_rows({h: p[4] for h, p in population.items()}, args.fraction, args.seed, args.min_per_stratum)
+    print(f"Sampled {sum(len(v) for v in sample.values())} of {sum(population_sizes.values())} rows "
+          f"across {len(sample)} experiments (fraction={args.fraction}, seed={args.seed!r})")
+
+    paths = write_sample(population, sample, model_dir, args.output_dir)
+
+    if not args.no_run:
+        backend = make_backend(args.backend, args.model, args.base_url, args.api_key_env, args.concurrency, args.rate, args.timeout,
+                               args.max_tokens_param, not args.no_temperature)
+        progress = RunProgress(args.model)
+        progress_line = ProgressLine(progress)
+        progress_line.start()
+        try:
+            run_experiments(backend, paths, resume=True, progress=progress,
+                            max_retries=args.max_retries, hedge=args.hedge)
+        finally:
+            progress_line.close()
+
+    items_by_stratum, failed_by_stratum = score_sample(paths, args.output_dir, model_dir, args.bert)
+    sampled = sum(len(v) for v in sample.values())
+    failed = sum(failed_by_stratum.values())
+    valid = failed <= args.max_failed_fraction * sampled
+    if failed:
+        print(f"\n{failed} of {sampled} sampled rows got no answer and are left out:")
+        for stratum, count in sorted(failed_by_stratum.items()):
+            if count:
+                print(f"  {stratum:<32} {count}/{len(sample[stratum])}")
+
+    compare = args.compare
+    if compare is None:
+        compare = sorted(d for d in os.listdir(CLEANED_DATA_DIR) if os.path.isdir(os.path.join(CLEANED_DATA_DIR, d)))
+    compare = [m for m in compare if m != model_dir]
+    full_runs = load_full_runs(compare, set(population))
+
+    summary = summarize(items_by_stratum, sample, population_sizes, full_runs)
+    if valid:
+        print_summary(args.model, summary)
+    else:
+        print(f"\nNot printing estimates: {failed / sampled:.0%} of the sample failed "
+              f"(limit {args.max_failed_fraction:.0%}). Fix the backend and rerun; answered rows are kept.")
+
+    report_path = os.path.join(args.output_dir, model_dir, 'report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'model': args.model,
+            'fraction': args.fraction,
+            'seed': args.seed,
+            'sample': sample,
+            'population_sizes': population_sizes,
+            'failed': failed_by_stratum,
+            'valid': valid,
+            'summary': summary,
+            'items': items_by_stratum,
+        }, f, indent=2, ensure_ascii=False)
+    print(f"\nWrote report to {report_path}")
+    if not valid:
+        exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import os
+import json
+import pickle
+import hashlib
+
+# Bump when the stored reference info changes shape
+INDEX_VERSION = 1
+
+def targets_key(targets):
+    """
+    Key for one prompt row's expanded targets. Every model answers the same
+    prompts, so rows with the same targets share one entry whatever the
+    model or category directory is called.
+    """
+    return hashlib.sha1(json.dumps(list(targets), ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class ReferenceIndex:
+    """
+    Reference-side sacrebleu state (tokenized references, BLEU/chrF n-gram
+    counters, TER reference words) per set of targets, so each model only
+    pays for its hypotheses.
+
+    `metrics` maps metric names to sacrebleu metric objects. Entries are built
+    on first lookup; `save` persists them next to cleaned_data for later runs.
+    """
+
+    def __init__(self, metrics, signature):
+        self.metrics = metrics
+        self.signature = signature
+        self.entries = {}
+        self.dirty = False
+
+    def build_entry(self, targets):
+        # Same steps as sacrebleu's Metric._cache_references for one segment
+        entry = {}
+        for name, metric in self.metrics.items():
+            refs = [metric._preprocess_segment(t) for t in targets]
+            entry[name] = metric._extract_reference_info(refs)
+        return entry
+
+    def lookup(self, targets):
+        key = targets_key(targets)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = self.build_entry(targets)
+            self.dirty = True
+        return entry
+
+    def load(self, path):
+        """Loads a saved index, ignoring it if it was built with other settings."""
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'rb') as f:
+                saved = pickle.load(f)
+        except Exception as e:
+            print(f"Error reading reference index {path}: {e}")
+            return False
+        if saved.get('version') != INDEX_VERSION or saved.get('signature') != self.signature:
+            print(f"Reference index {path} is stale, rebuilding.")
+            return False
+        self.entries.update(saved['entries'])
+        return True
+
+    def save(self, path):
+        if not self.dirty:
+            return
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'version': INDEX_VERSION,
+                'signature': self.signature,
+                'entries': self.entries,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.dirty = False
@@ -3,20 +3,24 @@ PYTHON_EXEC=".venv/bin/python"
 
 # Default to qwen2.5:14b if not provided
 MODEL_NAME="${1:-qwen2.5:14b}"
+shift
+
+# Remaining arguments (e.g. --backend openai --model-dir gpt5) go to every run
+EXTRA_ARGS=("$@")
 
 echo "Using Model: $MODEL_NAME"
 
 # Zero Shot
 echo "========================================"
 echo "Running Zero Shot 1..."
-$PYTHON_EXEC experimenterrr.py --model "$MODEL_NAME" --type "zero_shot" --number "1"
+$PYTHON_EXEC experimenterrr.py --model "$MODEL_NAME" --type "zero_shot" --number "1" "${EXTRA_ARGS[@]}"
 
 # Few Shot WORD
 for i in {1..5}
 do
    echo "========================================"
    echo "Running Few Shot WORD $i..."
-   $PYTHON_EXEC experimenterrr.py --model "$MODEL_NAME" --type "few_shot" --subtype "WORD" --number "$i"
+   $PYTHON_EXEC experimenterrr.py --model "$MODEL_NAME" --type "few_shot" --subtype "WORD" --number "$i" "${EXTRA_ARGS[@]}"
 done
 
 # Few Shot TRANSLATION
@@ -24,7 +28,7 @@ for i in {1..5}
 do
    echo "========================================"
    echo "Running Few Shot TRANSLATION $i..."
-   $PYTHON_EXEC experimenterrr.py --model "$MODEL_NAME" --type "few_shot" --subtype "TRANSLATION" --number "$i"
+   $PYTHON_EXEC experimenterrr.py --model "$MODEL_NAME" --type "few_shot" --subtype "TRANSLATION" --number "$i" "${EXTRA_ARGS[@]}"
 done
 
 # Gramatical Induction
@@ -32,7 +36,7 @@ for i in {1..5}
 do
    echo "========================================"
    echo "Running Gramatical Induction $i..."
-   $PYTHON_EXEC experimenterrr.py --model "$MODEL_NAME" --type "gramatical_induction" --number "$i"
+   $PYTHON_EXEC experimenterrr.py --model "$MODEL_NAME" --type "gramatical_induction" --number "$i" "${EXTRA_ARGS[@]}"
 done
 
 # Morphological Induction
@@ -40,5 +44,5 @@ for i in {1..1}
 do
    echo "========================================"
    echo "Running Morphological Induction $i..."
-   $PYTHON_EXEC experimenterrr.py --model "$MODEL_NAME" --type "morphological_induction" --number "$i"
+   $PYTHON_EXEC experimenterrr.py --model "$MODEL_NAME" --type "morphological_induction" --number "$i" "${EXTRA_ARGS[@]}"
 done
@@ -0,0 +1,258 @@
+import sys
+import time
+import threading
+from collections import deque, OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Rolling windows for latency percentiles and throughput/ETA
+LATENCY_WINDOW = 500
+THROUGHPUT_WINDOW = 100
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+def quantile(sorted_values, q):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+class RunProgress:
+    """
+    In-process counters for an experiment sweep: rows done/remaining and
+    errors per experiment, in-flight requests, rolling request latency,
+    generated tokens and ETA. Updated from the scheduler and read by the
+    metrics endpoint and the progress line, so every access takes the lock.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.experiments = OrderedDict()
+        self.current = None
+        self.in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.hedges = 0
+        self.tokens = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.completions = deque(maxlen=THROUGHPUT_WINDOW)
+        # ProgressLine showing these counters, if any; see log()
+        self.display = None
+
+    def add_experiment(self, name, total):
+        with self.lock:
+            self.experiments[name] = {'total': total, 'done': 0, 'errors': 0}
+
+    def start_experiment(self, name):
+        with self.lock:
+            self.current = name
+
+    def request_started(self):
+        with self.lock:
+            self.in_flight += 1
+            self.requests += 1
+
+    def request_finished(self, latency, tokens=None):
+        with self.lock:
+            self.in_flight -= 1
+            self.latencies.append(latency)
+            if tokens:
+                self.tokens += tokens
+
+    def retried(self):
+        with self.lock:
+            self.retries += 1
+
+    def hedged(self):
+        with self.lock:
+            self.hedges += 1
+
+    def row_done(self, name, error=False):
+        with self.lock:
+            experiment = self.experiments[name]
+            experiment['done'] += 1
+            if error:
+                experiment['errors'] += 1
+            self.completions.append(time.monotonic())
+
+    def log(self, message):
+        """Prints a message without breaking the live progress line."""
+        if self.display:
+            self.display.write(message)
+        else:
+            print(message)
+
+    def snapshot(self):
+        """Consistent copy of all counters plus the derived rates."""
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.started
+            total = sum(e['total'] for e in self.experiments.values())
+            done = sum(e['done'] for e in self.experiments.values())
+
+            if len(self.completions) > 1 and now > self.completions[0]:
+                rows_per_second = (len(self.completions) - 1) / (now - self.completions[0])
+            else:
+                rows_per_second = done / elapsed if elapsed > 0 else 0.0
+            remaining = total - done
+
+            latencies = sorted(self.latencies)
+            return {
+                'model': self.model,
+                'current': self.current,
+                'experiments': {name: dict(e) for name, e in self.experiments.items()},
+                'total': total,
+                'done': done,
+                'remaining': remaining,
+                'errors': sum(e['errors'] for e in self.experiments.values()),
+                'in_flight': self.in_flight,
+                'requests': self.requests,
+                'retries': self.retries,
+                'hedges': self.hedges,
+                'tokens': self.tokens,
+                'tokens_per_second': self.tokens / elapsed if elapsed > 0 else 0.0,
+                'rows_per_second': rows_per_second,
+                'eta_seconds': remaining / rows_per_second if rows_per_second > 0 else float('nan'),
+                'latency': {q: quantile(latencies, q) for q in QUANTILES},
+                'elapsed': elapsed,
+            }
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_text(progress):
+    """Renders the counters in the Prometheus text exposition format."""
+    s = progress.snapshot()
+    model = f'model="{_label(s["model"])}"'
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{{{labels}}} {value}")
+
+    per_experiment = [(f'{model},experiment="{_label(name)}"', e) for name, e in s['experiments'].items()]
+    metric('experiment_rows_total', 'gauge', 'Rows to run per experiment.',
+           [(labels, e['total']) for labels, e in per_experiment])
+    metric('experiment_rows_done', 'counter', 'Rows finished per experiment.',
+           [(labels, e['done']) for labels, e in per_experiment])
+    metric('experiment_rows_remaining', 'gauge', 'Rows left per experiment.',
+           [(labels, e['total'] - e['done']) for labels, e in per_experiment])
+    metric('experiment_errors_total', 'counter', 'Rows that ended in an ERROR answer per experiment.',
+           [(labels, e['errors']) for labels, e in per_experiment])
+    metric('requests_in_flight', 'gauge', 'Requests currently waiting on the backend.', [(model, s['in_flight'])])
+    metric('requests_total', 'counter', 'Requests sent to the backend, including retries and hedges.', [(model, s['requests'])])
+    metric('request_retries_total', 'counter', 'Requests retried after a retryable failure.', [(model, s['retries'])])
+    metric('request_hedges_total', 'counter', 'Duplicate requests sent because the first one was slower than the observed p95.', [(model, s['hedges'])])
+    metric('request_latency_seconds', 'summary', f'Request latency over the last {LATENCY_WINDOW} requests.',
+           [(f'{model},quantile="{q}"', v) for q, v in s['latency'].items()])
+    metric('completion_tokens_total', 'counter', 'Tokens generated by the backend.', [(model, s['tokens'])])
+    metric('completion_tokens_per_second', 'gauge', 'Generated tokens per second since the start.', [(model, s['tokens_per_second'])])
+    metric('sweep_eta_seconds', 'gauge', 'Estimated seconds until every experiment is done.', [(model, s['eta_seconds'])])
+    return '\n'.join(lines) + '\n'
+
+def serve_metrics(progress, port, host='127.0.0.1'):
+    """Serves /metrics from a daemon thread and returns the server."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = prometheus_text(progress).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def format_duration(seconds):
+    if seconds != seconds:  # NaN
+        return '--:--'
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+class ProgressLine:
+    """
+    Single, self-overwriting status line on stderr, redrawn every `interval`
+    seconds from a daemon thread so it stays live while requests are slow.
+
+    When the stream is not a terminal (log collection), it prints plain lines
+    instead: one every `log_interval` seconds and one per experiment.
+    """
+
+    def __init__(self, progress, interval=1.0, log_interval=60.0, stream=sys.stderr):
+        self.progress = progress
+        self.interval = interval
+        self.log_interval = log_interval
+        self.stream = stream
+        self.live = stream.isatty()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.last_logged = None
+        self.last_experiment = None
+
+    def render(self):
+        s = self.progress.snapshot()
+        current = s['experiments'].get(s['current'], {'done': 0, 'total': 0})
+        p50 = s['latency'][0.5]
+        p95 = s['latency'][0.95]
+        latency = f"p50 {p50:.1f}s p95 {p95:.1f}s" if p50 == p50 else "p50 -- p95 --"
+        return (f"[{s['done']}/{s['total']}] {s['current']} {current['done']}/{current['total']}"
+                f" | in-flight {s['in_flight']} | err {s['errors']} | {latency}"
+                f" | {s['tokens_per_second']:.1f} tok/s | ETA {format_duration(s['eta_seconds'])}")
+
+    def update(self, force=False):
+        with self.lock:
+            if self.live:
+                self.stream.write('\r\033[K' + self.render())
+            else:
+                now = time.monotonic()
+                current = self.progress.current
+                if not (force or current != self.last_experiment
+                        or self.last_logged is None or now - self.last_logged >= self.log_interval):
+                    return
+                self.last_logged = now
+                self.last_experiment = current
+                self.stream.write(self.render() + '\n')
+            self.stream.flush()
+
+    def write(self, message):
+        """Prints `message` on its own line and redraws the live line below it."""
+        with self.lock:
+            if self.live:
+                self.stream.write('\r\033[K' + message + '\n' + self.render())
+            else:
+                self.stream.write(message + '\n')
+            self.stream.flush()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.update()
+
+    def start(self):
+        self.progress.display = self
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+        self.progress.display = None
+        self.update(force=True)
+        if self.live:
+            self.stream.write('\n')
+        self.stream.flush()
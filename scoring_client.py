@@ -0,0 +1,60 @@
+import os
+import json
+import urllib.request
+import urllib.error
+
+# Where scoring_server.py listens; override to run it elsewhere
+SCORING_SERVER_URL = os.environ.get('SCORING_SERVER_URL', 'http://127.0.0.1:8765')
+
+# Health check must be fast so the in-process fallback is not delayed
+HEALTH_TIMEOUT = 0.2
+
+_available = None
+
+def disable():
+    """Never use the server from this process (used by the server itself)."""
+    global _available
+    _available = False
+
+def server_available():
+    """
+    True if a scoring server answers its health check. The result is cached
+    for the lifetime of the process.
+    """
+    global _available
+    if _available is None:
+        try:
+            with urllib.request.urlopen(SCORING_SERVER_URL + '/health', timeout=HEALTH_TIMEOUT) as response:
+                _available = response.status == 200
+        except (urllib.error.URLError, OSError, ValueError):
+            _available = False
+    return _available
+
+def score_remote(endpoint, payload):
+    """
+    POSTs a scoring job to the server and returns the decoded JSON reply.
+    Raises RuntimeError if the server rejects the job.
+    """
+    request = urllib.request.Request(
+        SCORING_SERVER_URL + endpoint,
+        data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"Scoring server error {e.code}: {e.read().decode('utf-8', 'replace')}")
+
+def score_or_fallback(endpoint, payload, local_fn, from_reply=lambda reply: reply):
+    """
+    Scores on the warm scoring server if one is running, in-process otherwise.
+    `from_reply` turns the server's JSON reply into what `local_fn()` returns;
+    if the server fails mid-job the job is rerun locally.
+    """
+    if server_available():
+        try:
+            return from_reply(score_remote(endpoint, payload))
+        except Exception as e:
+            print(f"Scoring server failed ({e}), scoring in-process.")
+    return local_fn()
@@ -0,0 +1,132 @@
+import os
+import json
+import logging
+import argparse
+import signal
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+import scoring_client
+import compute_translation_metrics
+import compute_bert_score
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# One job at a time: the BERT model is shared and not thread-safe
+_score_lock = threading.Lock()
+
+def handle_translation(payload):
+    return {'scores': compute_translation_metrics.score_translation_items(payload['items'])}
+
+def handle_bert(payload):
+    P, R, F1 = compute_bert_score.bert_scores_local(payload['cands'], payload['refs'])
+    return {'P': P, 'R': R, 'F1': F1}
+
+def handle_files(payload):
+    """Scores whole cleaned_data JSON files in place, like the CLIs do."""
+    metrics = payload.get('metrics', ['translation', 'bert'])
+    for json_file_path in payload['files']:
+        if 'translation' in metrics:
+            compute_translation_metrics.compute_metrics(json_file_path)
+        if 'bert' in metrics:
+            compute_bert_score.compute_bert_metrics(json_file_path)
+    return {'processed': len(payload['files'])}
+
+ROUTES = {
+    '/score/translation': handle_translation,
+    '/score/bert': handle_bert,
+    '/score/files': handle_files,
+}
+
+class ScoringHandler(BaseHTTPRequestHandler):
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._reply(200, {'status': 'ok', 'bert_loaded': compute_bert_score._scorer is not None})
+        else:
+            self._reply(404, {'error': f'Unknown path {self.path}'})
+
+    def do_POST(self):
+        handler = ROUTES.get(self.path)
+        if handler is None:
+            self._reply(404, {'error': f'Unknown path {self.path}'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length).decode('utf-8'))
+        except (ValueError, UnicodeDecodeError) as e:
+            self._reply(400, {'error': f'Invalid JSON: {e}'})
+            return
+
+        start = time.perf_counter()
+        try:
+            with _score_lock:
+                result = handler(payload)
+        except KeyError as e:
+            self._reply(400, {'error': f'Missing field {e}'})
+            return
+        except Exception as e:
+            logger.error(f"Error handling {self.path}: {e}")
+            self._reply(500, {'error': str(e)})
+            return
+
+        logger.info(f"{self.path} done in {time.perf_counter() - start:.2f}s")
+        self._reply(200, result)
+
+    def log_message(self, format, *args):
+        # Requests are logged once they finish, see do_POST
+        pass
+
+def stop_on_sigterm(signum, frame):
+    # kill/systemd stop the server with SIGTERM; unwind like Ctrl-C so the
+    # reference index is still saved. Calling server.shutdown() here would
+    # deadlock, since serve_forever runs in this same thread.
+    raise KeyboardInterrupt
+
+def main():
+    default = urlparse(scoring_client.SCORING_SERVER_URL)
+    parser = argparse.ArgumentParser(description='Keep BERTScore and sacrebleu loaded and serve scoring jobs to the metric CLIs.')
+    parser.add_argument('--host', default=default.hostname, help='Address to bind (keep it local).')
+    parser.add_argument('--port', type=int, default=default.port, help='Port to listen on.')
+    parser.add_argument('--no-bert', action='store_true', help='Do not preload the BERTScore model (it is then loaded on the first BERT job).')
+    parser.add_argument('--reference-index', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cleaned_data', compute_translation_metrics.REFERENCE_INDEX_FILE), help='Reference index to preload, and to save new entries to on shutdown.')
+    args = parser.parse_args()
+
+    # Never forward jobs to ourselves
+    scoring_client.disable()
+
+    logger.info("Warming up sacrebleu...")
+    reference_index = compute_translation_metrics.get_reference_index()
+    if reference_index.load(args.reference_index):
+        logger.info(f"Loaded {len(reference_index.entries)} reference entries from {args.reference_index}")
+    compute_translation_metrics.score_translation('warm up', ['warm up'])
+    if not args.no_bert:
+        logger.info("Loading BERTScore model...")
+        compute_bert_score.bert_scores_local(['warm up'], [['warm up']])
+
+    server = ThreadingHTTPServer((args.host, args.port), ScoringHandler)
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
+    logger.info(f"Scoring server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down.")
+    finally:
+        server.server_close()
+        if os.path.isdir(os.path.dirname(args.reference_index)):
+            reference_index.save(args.reference_index)
+
+if __name__ == "__main__":
+    main()
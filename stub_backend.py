@@ -0,0 +1,162 @@
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Per-prompt behaviour for scripted checks, e.g. "[stub fail=2 status=429 retry_after=1]"
+# fails the first two attempts at that prompt with a 429 and Retry-After: 1.
+# sleep_first=S sleeps S seconds on the first attempt only.
+DIRECTIVE = re.compile(r'\[stub ([^\]]*)\]')
+
+class StubBackend:
+    """
+    Local stand-in for an Ollama or OpenAI-compatible server, for exercising
+    the scheduler without a GPU or an API key. Answers both /api/generate and
+    /v1/chat/completions with an echo of the prompt.
+
+    Besides the per-prompt directives above, `error_rate` fails random
+    requests with a 429 or 503, and every `slow_every`-th request sleeps
+    `slow_seconds`. It records request start times, attempts per prompt and
+    the peak number of concurrent requests so checks can assert on them.
+    """
+
+    def __init__(self, latency=0.01, error_rate=0.0, slow_every=0, slow_seconds=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.slow_every = slow_every
+        self.slow_seconds = slow_seconds
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.started = []
+            self.attempts = Counter()
+
+    def respond(self, prompt):
+        """Returns (status, headers, delay) for one request."""
+        with self.lock:
+            self.requests += 1
+            number = self.requests
+            self.started.append(time.monotonic())
+            self.attempts[prompt] += 1
+            attempt = self.attempts[prompt]
+            roll = self.random.random()
+
+        options = {}
+        match = DIRECTIVE.search(prompt)
+        if match:
+            options = dict(pair.split('=', 1) for pair in match.group(1).split())
+
+        delay = self.latency
+        if attempt == 1 and 'sleep_first' in options:
+            delay = float(options['sleep_first'])
+        elif self.slow_every and number % self.slow_every == 0:
+            delay = self.slow_seconds
+
+        if attempt <= int(options.get('fail', 0)):
+            headers = {'Retry-After': options['retry_after']} if 'retry_after' in options else {}
+            return int(options.get('status', 503)), headers, delay
+        if roll < self.error_rate:
+            return (429, {'Retry-After': '1'}, delay) if roll < self.error_rate / 2 else (503, {}, delay)
+        return 200, {}, delay
+
+    def handler(self):
+        stub = self
+
+        class StubHandler(BaseHTTPRequestHandler):
+
+            def _reply(self, status, body, headers):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on this request (deadline or lost hedge)
+                    pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length).decode('utf-8'))
+                if self.path.endswith('/chat/completions'):
+                    prompt = payload['messages'][-1]['content']
+                elif self.path == '/api/generate':
+                    prompt = payload['prompt']
+                else:
+                    self._reply(404, {'error': f'Unknown path {self.path}'}, {})
+                    return
+
+                with stub.lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    status, headers, delay = stub.respond(prompt)
+                    time.sleep(delay)
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+                if status != 200:
+                    self._reply(status, {'error': 'stub failure'}, headers)
+                    return
+                text = f"echo: {prompt}"
+                tokens = len(text.split())
+                if self.path == '/api/generate':
+                    self._reply(200, {'response': text, 'eval_count': tokens}, {})
+                else:
+                    self._reply(200, {
+                        'choices': [{'message': {'role': 'assistant', 'content': text}}],
+                        'usage': {'completion_tokens': tokens},
+                    }, {})
+
+            def log_message(self, format, *args):
+                pass
+
+        return StubHandler
+
+    def serve(self, port=0, host='127.0.0.1'):
+        """Serves from a daemon thread; returns the server (port 0 picks a free port)."""
+        server = ThreadingHTTPServer((host, port), self.handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for an Ollama or OpenAI-compatible server.')
+    parser.add_argument('--port', type=int, default=18080, help='Port to listen on.')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds every request takes.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests failed with a 429 (Retry-After: 1) or a 503.')
+    parser.add_argument('--slow-every', type=int, default=0, help='Make every Nth request slow (0 for never).')
+    parser.add_argument('--slow-seconds', type=float, default=3.0, help='How long slow requests take.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the random failures.')
+    args = parser.parse_args()
+
+    stub = StubBackend(args.latency, args.error_rate, args.slow_every, args.slow_seconds, args.seed)
+    server = stub.serve(args.port)
+    print(f"Stub backend on http://127.0.0.1:{args.port} "
+          f"(--backend ollama --base-url http://127.0.0.1:{args.port}/api/generate, "
+          f"or --backend openai --base-url http://127.0.0.1:{args.port}/v1)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        print(f"Served {stub.requests} requests, peak concurrency {stub.max_in_flight}.")
+
+if __name__ == "__main__":
+    main()